@@ -0,0 +1,95 @@
+"""Measures the memory used by a deserialized script, per line.
+
+Run from the repository root with `python -m benchmarks.model_memory`.
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from txt2dub.models import ScriptMetadata, ScriptVoiceMetadata, ScriptModel
+
+
+VOICES = 4
+RATES = (150, 175, 200, 225,)
+PHRASES = (
+    "Yes.",
+    "No.",
+    "Thank you.",
+    "Previously, on the show.",
+)
+
+
+def script_data(lines, seed=0):
+    """Returns serialized script data for `lines` lines, where most lines
+    share a handful of voice settings and some lines repeat."""
+
+    rng = random.Random(seed)
+    return {
+        "version": "benchmark",
+        "driver": "benchmark",
+        "lines": [
+            {
+                "text": (
+                    rng.choice(PHRASES)
+                        if rng.random() < 0.25
+                        else f"Line {n} of the script, spoken with feeling."),
+                "voice": {
+                    "id": f"voice-{rng.randrange(VOICES)}",
+                    "rate": rng.choice(RATES),
+                },
+            }
+                for n
+                in range(lines)
+        ],
+    }
+
+
+def script_meta():
+    return (
+        ScriptMetadata(
+            "benchmark",
+            "benchmark",
+            [
+                ScriptVoiceMetadata(f"voice-{n}", f"Voice {n}")
+                    for n
+                    in range(VOICES)
+            ]))
+
+
+def measure(lines):
+    """Returns the bytes held by a script of `lines` lines loaded from
+    JSON, including its text but not the JSON itself."""
+
+    meta = script_meta()
+    data = json.dumps(script_data(lines))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        script = ScriptModel.deserialize(json.loads(data), meta)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(script) == lines
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=50000,
+        help="the number of script lines (default: %(default)s)")
+    args = parser.parse_args()
+    total = measure(args.lines)
+    print(f"lines: {args.lines}")
+    print(f"total: {total / (1024 * 1024):.2f} MiB")
+    print(f"per line: {total / args.lines:.1f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Measures a batch generated through the local render service against the
+same batch generated without it.
+
+Run from the repository root with `python -m benchmarks.render_service`.
+The batch has more scripts than the service's queue and pool together,
+and fails if either run doesn't generate every script in time.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+from txt2dub.tts.engines import FakeEngine
+
+
+PHRASES = (
+    "Welcome back to the show.",
+    "Thanks for listening.",
+)
+
+
+def write_scripts(directory, scripts, lines):
+    """Writes `scripts` scripts of `lines` lines each, sharing a few lines
+    between them, spoken with the fake engine's voices."""
+
+    voices = [id for id, _, _ in FakeEngine.VOICES]
+    for n in range(scripts):
+        with open(
+                directory / f"script-{n:03d}.txt2dub.json",
+                "w",
+                encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": "benchmark",
+                    "driver": "benchmark",
+                    "lines": [
+                        {
+                            "text": (
+                                PHRASES[m % len(PHRASES)]
+                                    if m < len(PHRASES)
+                                    else f"Script {n}, line {m}."),
+                            "voice": {
+                                "id": voices[m % len(voices)],
+                                "rate": 200,
+                            },
+                        }
+                            for m
+                            in range(lines)
+                    ],
+                },
+                f)
+
+
+def batch(source, output, env, timeout):
+    """Runs a batch, returning its elapsed time and summary, or `None` for
+    the summary if it timed out."""
+
+    started = time.perf_counter()
+    try:
+        completed = (
+            subprocess.run(
+                [sys.executable, "-m", "txt2dub", "batch", f"{source}",
+                 "--output-dir", f"{output}"],
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=timeout))
+    except subprocess.TimeoutExpired:
+        return time.perf_counter() - started, None
+    elapsed = time.perf_counter() - started
+    events = [
+        json.loads(line)
+            for line
+            in completed.stdout.splitlines()
+            if line.strip()
+    ]
+    return elapsed, (
+        events[-1]
+            if events and events[-1].get("event") == "done"
+            else {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scripts",
+        type=int,
+        default=80,
+        help="the number of scripts in the batch (default: %(default)s)")
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=20,
+        help="the number of lines per script (default: %(default)s)")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=2,
+        help="the number of processes in the pool (default: %(default)s)")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="the render service's queue size (default: %(default)s)")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120,
+        help="the seconds each batch may take (default: %(default)s)")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as dir:
+        dir = pathlib.Path(dir)
+        source = dir / "scripts"
+        source.mkdir()
+        write_scripts(source, args.scripts, args.lines)
+        env = dict(
+            os.environ,
+            TXT2DUB_CACHE_DIR=f"{dir / 'cache'}",
+            TXT2DUB_CACHE_SIZE="0",
+            TXT2DUB_ENGINE="fake:sample_rate=100",
+            TXT2DUB_RENDER_SERVICE="0")
+        runs = {}
+        runs["private"] = batch(source, dir / "private", env, args.timeout)
+        env["TXT2DUB_RENDER_SERVICE"] = f"{dir / 'render.sock'}"
+        service = (
+            subprocess.Popen(
+                [sys.executable, "-m", "txt2dub", "serve",
+                 "--jobs", f"{args.jobs}",
+                 "--queue-size", f"{args.queue_size}"],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True))
+        try:
+            listening = json.loads(service.stdout.readline() or "{}")
+            if listening.get("event") != "listening":
+                sys.exit(f"The render service didn't start: {listening}")
+            runs["service"] = batch(source, dir / "service", env, args.timeout)
+        finally:
+            service.terminate()
+            service.wait()
+    print(
+        f"scripts: {args.scripts}, lines: {args.lines}, " \
+        f"jobs: {args.jobs}, queue: {args.queue_size}")
+    failed = False
+    for name, (elapsed, summary) in runs.items():
+        if summary is None:
+            print(f"{name}: timed out after {elapsed:.1f} s")
+            failed = True
+        else:
+            generated = summary.get("scripts", 0) - summary.get("failed", 0)
+            print(
+                f"{name}: {generated} of {args.scripts} scripts " \
+                f"in {elapsed:.3f} s")
+            failed = failed or generated != args.scripts
+    sys.exit(
+        1
+            if failed
+            else 0)
+
+
+if __name__ == "__main__":
+    main()
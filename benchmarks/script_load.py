@@ -0,0 +1,107 @@
+"""Measures how long it takes to load a saved script, and to show its first
+page.
+
+Run from the repository root with `python -m benchmarks.script_load`.
+"""
+
+import argparse
+import json
+import pathlib
+import tempfile
+import time
+from txt2dub.models import ScriptModel
+from txt2dub.services import storage
+from .model_memory import script_data, script_meta
+
+
+def best(function, repeat):
+    """Returns the shortest time `function` took over `repeat` runs."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def load_whole(path, meta):
+    """Loads a script the way it was loaded before it was streamed: the
+    whole document, then every line."""
+
+    with open(path, "r", encoding="utf-8") as f:
+        return ScriptModel.deserialize(json.load(f), meta)
+
+
+def load_first_page(path, meta):
+    loader = storage.ScriptLoader(path, meta)
+    loader.close()
+    return loader.script
+
+
+def load_progressively(path, meta):
+    loader = storage.ScriptLoader(path, meta)
+    try:
+        while True:
+            first, last = loader.read()
+            if first is None:
+                break
+            loader.add(first, last)
+    finally:
+        loader.close()
+    return loader.script
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=100000,
+        help="the number of script lines (default: %(default)s)")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="the number of runs to take the best of (default: %(default)s)")
+    args = parser.parse_args()
+    meta = script_meta()
+    script = ScriptModel.deserialize(script_data(args.lines), meta)
+    with tempfile.TemporaryDirectory() as dir:
+        paths = {
+            "lines": pathlib.Path(dir, "lines.txt2dub.json"),
+            "json": pathlib.Path(dir, "json.txt2dub.json"),
+            "indented": pathlib.Path(dir, "indented.txt2dub.json"),
+        }
+        storage.save_script(
+            paths["lines"],
+            storage.snapshot(script),
+            "lines")
+        storage.save_script(
+            paths["json"],
+            storage.snapshot(script),
+            "json")
+        with open(paths["indented"], "w", encoding="utf-8") as f:
+            json.dump(script.serialize(), f, indent=4)
+
+        print(f"lines: {args.lines}")
+        for format, path in paths.items():
+            print(f"{format} ({path.stat().st_size / (1024 * 1024):.1f} MiB):")
+            if format != "lines":
+                whole = best(lambda: load_whole(path, meta), args.repeat)
+                print(f"  whole document: {whole:.3f} s")
+            for name, load in (
+                ("streamed", storage.load_script),
+                ("progressive", load_progressively),
+                ("first page", load_first_page),):
+
+                assert (
+                    name == "first page" or
+                    len(load(path, meta)) == args.lines)
+                print(
+                    f"  {name}: "
+                    f"{best(lambda: load(path, meta), args.repeat):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
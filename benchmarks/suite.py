@@ -0,0 +1,655 @@
+"""Measures txt2dub's hot paths and prints the results as JSON.
+
+Run from the repository root with `python -m benchmarks.suite`, and
+compare two commits by saving each run with `--output` and passing the
+older one to `--compare`.
+
+Text-to-speech benchmarks use the fake engine, so they measure txt2dub's
+own overhead rather than speech synthesis, and run without speech voices.
+Caches are kept in a temporary directory.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from txt2dub.models import ScriptModel
+from txt2dub.models.script import ScriptLineModel, ScriptVoiceModel
+from txt2dub.services.transport import ProcessTransport, Transport
+from .model_memory import script_data, script_meta
+
+
+GROUPS = ("model", "serialize", "undo", "tts", "interpreter", "screen",)
+SIZES = (1000, 10000, 100000,)
+QUICK_SIZES = (1000, 10000,)
+OPS = 1000
+PROCESS_SIZE = 10000
+SCROLL_STEPS = 20
+ENGINE = "fake:sample_rate=100"
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def result(name, seconds, ops=1, **params):
+    """Returns a benchmark result, with its throughput when it times more
+    than one operation."""
+
+    value = {
+        "name": name,
+        "params": params,
+        "seconds": seconds,
+    }
+    if ops > 1:
+        value["ops"] = ops
+        value["ops_per_second"] = (
+            ops / seconds
+                if seconds > 0
+                else None)
+    log(f"  {name} {params}: {seconds:.4f} s")
+    return value
+
+
+def best(run, repeat, setup=None):
+    """Returns the shortest time `run` took over `repeat` runs, each given
+    a fresh result of `setup` that isn't timed."""
+
+    times = []
+    for _ in range(repeat):
+        state = (
+            setup()
+                if setup is not None
+                else None)
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+async def best_async(run, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        state = (
+            await setup()
+                if setup is not None
+                else None)
+        start = time.perf_counter()
+        await run(state)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def build_script(lines):
+    return ScriptModel.deserialize(script_data(lines), script_meta())
+
+
+def bench_model(sizes, repeat):
+    meta = script_meta()
+    results = []
+    for size in sizes:
+        data = script_data(size)
+
+        def append(_):
+            script = ScriptModel(meta)
+            for line in data["lines"]:
+                script.add(ScriptLineModel.deserialize(script, line))
+
+        results.append(
+            result(
+                "model.add",
+                best(append, repeat),
+                ops=size,
+                lines=size))
+
+        def insert_middle(script):
+            after = script.line_at(len(script) // 2)
+            voice = ScriptVoiceModel.new(script)
+            for n in range(OPS):
+                script.add(ScriptLineModel(script, f"New {n}", voice), after)
+
+        results.append(
+            result(
+                "model.add_middle",
+                best(insert_middle, repeat, lambda: build_script(size)),
+                ops=OPS,
+                lines=size))
+
+        def remove_middle(script):
+            for _ in range(min(OPS, size)):
+                script.remove(script.line_at(len(script) // 2))
+
+        results.append(
+            result(
+                "model.remove_middle",
+                best(remove_middle, repeat, lambda: build_script(size)),
+                ops=min(OPS, size),
+                lines=size))
+
+        script = build_script(size)
+        results.append(
+            result(
+                "model.iterate",
+                best(lambda _: sum(1 for _ in script), repeat),
+                ops=size,
+                lines=size))
+        positions = random.Random(0).choices(range(size), k=OPS)
+        results.append(
+            result(
+                "model.line_at",
+                best(
+                    lambda _: [script.line_at(n) for n in positions],
+                    repeat),
+                ops=OPS,
+                lines=size))
+    return results
+
+
+def bench_serialize(sizes, repeat):
+    meta = script_meta()
+    results = []
+    for size in sizes:
+        script = build_script(size)
+        text = json.dumps(script.serialize())
+        results.append(
+            result(
+                "serialize.serialize",
+                best(lambda _: json.dumps(script.serialize()), repeat),
+                ops=size,
+                lines=size))
+        results.append(
+            result(
+                "serialize.deserialize",
+                best(
+                    lambda _: ScriptModel.deserialize(json.loads(text), meta),
+                    repeat),
+                ops=size,
+                lines=size))
+        results.append(
+            result(
+                "serialize.round_trip",
+                best(
+                    lambda _: (
+                        ScriptModel.deserialize(
+                            json.loads(json.dumps(script.serialize())),
+                            meta)),
+                    repeat),
+                ops=size,
+                lines=size))
+    return results
+
+
+class TextEditor(object):
+    """Stands in for the script screen as the owner of undo actions, so
+    they can be spilled with its codec."""
+
+    def __init__(self, script):
+        self.script = script
+
+    def set_text(self, line, text):
+        line.text = text
+
+
+async def bench_undo(sizes, repeat):
+    from txt2dub.screens.script.screen import ScriptActionsCodec
+    from txt2dub.services.actions import (
+        DEFAULT_LIMIT,
+        Actions,
+        ActionsLog,
+        ActionsManager,
+    )
+
+    managers = []
+
+    async def prepare(limit):
+        """Returns a script editor and an undo manager for it, which spills
+        all but `limit` actions to disk, or keeps them all in memory."""
+
+        editor = TextEditor(build_script(1000))
+        actions = (
+            ActionsManager(
+                limit=limit,
+                codec=(
+                    ScriptActionsCodec(editor)
+                        if limit is not None
+                        else None),
+                log=ActionsLog(tempfile.gettempdir())))
+        managers.append(actions)
+        return editor, actions
+
+    async def edit(state, history):
+        editor, actions = state
+        line = editor.script.head
+        for n in range(history):
+            text = f"Edit {n}"
+            actions.add(
+                Actions(
+                    editor.set_text,
+                    editor.set_text,
+                    undo_context={"line": line, "text": line.text},
+                    redo_context={"line": line, "text": text}))
+            line.text = text
+            line = line.next or editor.script.head
+        return state
+
+    async def undo_all(state):
+        _, actions = state
+        while not actions.undo_empty:
+            await actions.undo()
+        return state
+
+    async def redo_all(state):
+        _, actions = state
+        while not actions.redo_empty:
+            await actions.redo()
+
+    async def edited(history, limit):
+        return await edit(await prepare(limit), history)
+
+    async def undone(history, limit):
+        return await undo_all(await edited(history, limit))
+
+    results = []
+    try:
+        for history in sizes:
+            for limit in (DEFAULT_LIMIT, None,):
+                params = {
+                    "history": history,
+                    "limit": limit,
+                }
+                results.append(
+                    result(
+                        "undo.add",
+                        await (
+                            best_async(
+                                lambda state: edit(state, history),
+                                repeat,
+                                lambda: prepare(limit))),
+                        ops=history,
+                        **params))
+                results.append(
+                    result(
+                        "undo.undo",
+                        await (
+                            best_async(
+                                undo_all,
+                                repeat,
+                                lambda: edited(history, limit))),
+                        ops=history,
+                        **params))
+                results.append(
+                    result(
+                        "undo.redo",
+                        await (
+                            best_async(
+                                redo_all,
+                                repeat,
+                                lambda: undone(history, limit))),
+                        ops=history,
+                        **params))
+                for actions in managers:
+                    actions.close()
+                managers.clear()
+    finally:
+        for actions in managers:
+            actions.close()
+    return results
+
+
+class LoopbackTransport(Transport):
+    """A fake interpreter in the same process, answering every request as
+    soon as it's written, so only the interface's own overhead is timed.
+    """
+
+    def __init__(self, meta):
+        super().__init__(None, None)
+        self.meta = meta
+        self.responses = asyncio.Queue()
+
+    async def readline(self):
+        return await self.responses.get()
+
+    async def write(self, data):
+        for line in data.splitlines():
+            request = json.loads(line)
+            response = {
+                "type": "result",
+                "value": (
+                    self.meta
+                        if request.get("command") == "meta"
+                        else "ok"),
+                "id": request["id"],
+            }
+            self.responses.put_nowait((json.dumps(response) + "\n").encode())
+
+    async def close(self):
+        self.responses.put_nowait(b"")
+
+
+async def bench_tts(sizes, repeat):
+    from txt2dub.cli import runner
+    from txt2dub.services.tts import TTSInterface
+
+    meta = {
+        "version": "benchmark",
+        "driver": "benchmark",
+        "voices": [{"id": "voice-0", "name": "Voice 0"}],
+    }
+
+    async def loopback():
+        return LoopbackTransport(meta)
+
+    results = []
+    for interpreter, connect in (
+        ("loopback", loopback),
+        ("process", ProcessTransport.start),):
+
+        tts = TTSInterface(runner, jobs=1, connect=connect)
+        try:
+            await tts.meta()
+            for size in sizes:
+                if interpreter == "process" and size > PROCESS_SIZE:
+                    continue
+
+                async def sequential(_):
+                    for _ in range(size):
+                        await tts.request(command="meta")
+
+                async def concurrent(_):
+                    await (
+                        asyncio.gather(
+                            *(
+                                tts.request(command="meta")
+                                    for _
+                                    in range(size))))
+
+                for name, run in (
+                    ("tts.request", sequential),
+                    ("tts.request_concurrent", concurrent),):
+
+                    results.append(
+                        result(
+                            name,
+                            await best_async(run, repeat),
+                            ops=size,
+                            requests=size,
+                            interpreter=interpreter))
+        finally:
+            await tts.terminate()
+    return results
+
+
+def fake_lines(size):
+    """Returns serialized script lines for `size` lines, spoken with the
+    fake engine's voices."""
+
+    from txt2dub.tts.engines import FakeEngine
+
+    voices = [id for id, _, _ in FakeEngine.VOICES]
+    return [
+        {
+            "text": line["text"],
+            "voice": {
+                "id": voices[n % len(voices)],
+                "rate": line["voice"]["rate"],
+            },
+        }
+            for n, line
+            in enumerate(script_data(size)["lines"])
+    ]
+
+
+def bench_interpreter(sizes, repeat):
+    from txt2dub.tts.cache import AudioCache
+    from txt2dub.tts.engines import create_engine
+    from txt2dub.tts.interpreter import Interpreter
+
+    results = []
+    with tempfile.TemporaryDirectory() as dir:
+        runs = iter(range(sys.maxsize))
+
+        def interpreter(cache):
+            return (
+                Interpreter(
+                    "benchmark",
+                    cache=AudioCache(pathlib.Path(dir, cache), 1 << 40),
+                    engine=create_engine(ENGINE)))
+
+        for size in sizes:
+            if size > PROCESS_SIZE:
+                continue
+            lines = fake_lines(size)
+
+            def cold():
+                return interpreter(f"cold-{next(runs)}"), f"cold-{size}"
+
+            def warm():
+                return interpreter(f"warm-{size}"), f"warm-{size}"
+
+            def generate(state):
+                interpreter, cache = state
+                interpreter.generate(
+                    pathlib.Path(dir, f"{cache}-{next(runs)}.zip"),
+                    lines,
+                    incremental=False)
+
+            generate(warm())
+            for name, setup in (
+                ("interpreter.generate_cold", cold),
+                ("interpreter.generate_warm", warm),):
+
+                results.append(
+                    result(
+                        name,
+                        best(generate, repeat, setup),
+                        ops=size,
+                        lines=size))
+    return results
+
+
+async def bench_screen(sizes, repeat):
+    from txt2dub.app import App
+    from txt2dub.screens.script.screen import ScriptScreen
+
+    results = []
+    app = App(jobs=1)
+    async with app.run_test(size=(160, 50)) as pilot:
+        while app.tts is None:
+            await pilot.pause()
+        meta = await app.tts.meta()
+
+        async def close():
+            if isinstance(app.screen, ScriptScreen):
+                app.pop_screen()
+                await pilot.pause()
+
+        for size in sizes:
+            async def script():
+                await close()
+                script = ScriptModel.new(meta)
+                first, last = (
+                    script.build(
+                        (
+                            f"Line {n} of the script, spoken with feeling."
+                                for n
+                                in range(1, size)),
+                        script.head.voice))
+                script.splice(first, last)
+                return script
+
+            async def mount(script):
+                screen = ScriptScreen(None, script)
+                app.push_screen(screen)
+                while screen.lines is None or not screen.lines.nodes:
+                    await asyncio.sleep(0)
+                await pilot.pause()
+
+            results.append(
+                result(
+                    "screen.mount",
+                    await best_async(mount, repeat, script),
+                    lines=size))
+
+            async def mounted():
+                await mount(await script())
+                return app.screen
+
+            async def scroll(screen):
+                lines = screen.lines
+                for step in range(1, SCROLL_STEPS + 1):
+                    lines.scroll_to(
+                        y=lines.max_scroll_y * step / SCROLL_STEPS,
+                        animate=False)
+                    await pilot.pause()
+
+            results.append(
+                result(
+                    "screen.scroll",
+                    await best_async(scroll, repeat, mounted),
+                    ops=SCROLL_STEPS,
+                    lines=size))
+        await close()
+    return results
+
+
+def commit():
+    """Returns the commit being measured, or `None` outside a git
+    checkout."""
+
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=pathlib.Path(__file__).parent,
+                capture_output=True,
+                check=True,
+                text=True)
+                .stdout
+                .strip())
+
+
+def result_key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(baseline, report):
+    """Logs how much each result changed from the `baseline` report."""
+
+    before = {
+        result_key(result): result["seconds"]
+            for result
+            in baseline["results"]
+    }
+    log(f"{baseline.get('commit')} -> {report.get('commit')}:")
+    for result in report["results"]:
+        old = before.get(result_key(result))
+        if old:
+            log(
+                f"  {result['name']} {result['params']}: " \
+                f"{old:.4f} s -> {result['seconds']:.4f} s " \
+                f"({result['seconds'] / old - 1:+.1%})")
+
+
+BENCHMARKS = {
+    "model": bench_model,
+    "serialize": bench_serialize,
+    "undo": bench_undo,
+    "tts": bench_tts,
+    "interpreter": bench_interpreter,
+    "screen": bench_screen,
+}
+
+
+def sizes(value):
+    try:
+        return tuple(int(size) for size in value.split(","))
+    except ValueError:
+        raise (
+            argparse.ArgumentTypeError(
+                f"{value} is not a comma separated list of sizes"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=GROUPS,
+        default=GROUPS,
+        help="the benchmarks to run (default: all)")
+    parser.add_argument(
+        "--sizes",
+        type=sizes,
+        default=None,
+        help="comma separated script sizes in lines, or history lengths " \
+             "for undo (default: 1000,10000,100000, with at most " \
+             f"{PROCESS_SIZE} lines through the interpreter)")
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help=f"only measure up to {QUICK_SIZES[-1]} lines")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="the number of runs to take the best of (default: %(default)s)")
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=None,
+        help="the file to write the results to (default: standard output)")
+    parser.add_argument(
+        "--compare",
+        type=pathlib.Path,
+        default=None,
+        help="the results of an earlier run to compare with")
+    args = parser.parse_args()
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    with tempfile.TemporaryDirectory() as cache:
+        os.environ["TXT2DUB_CACHE_DIR"] = cache
+        os.environ["TXT2DUB_ENGINE"] = ENGINE
+        os.environ["TXT2DUB_RENDER_SERVICE"] = "0"
+        results = []
+        for group in GROUPS:
+            if group in args.only:
+                log(f"{group}:")
+                measured = (
+                    BENCHMARKS[group](
+                        args.sizes or (
+                            QUICK_SIZES
+                                if args.quick
+                                else SIZES),
+                        args.repeat))
+                if asyncio.iscoroutine(measured):
+                    measured = asyncio.run(measured)
+                results.extend(measured)
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline is not None:
+        compare(baseline, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from txt2dub.tts.cache import AudioCache
+
+
+class AudioCacheTest(unittest.TestCase):
+    def test_evict_to_low_water_mark(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = AudioCache(pathlib.Path(directory) / "cache", size=1000)
+            for n in range(11):
+                source = pathlib.Path(directory) / f"source{n}"
+                source.write_bytes(b"0" * 100)
+                path = cache.put(f"{n}", ".wav", source)
+                os.utime(path, (n, n))
+            self.assertEqual(cache.used, 900)
+            self.assertEqual(
+                {path.name for path in cache.directory.glob("*.wav")},
+                {f"{n}.wav" for n in range(2, 11)})
@@ -0,0 +1,27 @@
+import pathlib
+import tempfile
+import unittest
+
+from txt2dub.services.catalog import VoiceCatalog
+
+
+def meta(driver, version="1.0"):
+    return {
+        "version": version,
+        "driver": driver,
+        "voices": [{"id": f"{driver}.voice", "name": "Voice"}],
+    }
+
+
+class VoiceCatalogTest(unittest.TestCase):
+    def test_entries_by_engine(self):
+        with tempfile.TemporaryDirectory() as directory:
+            catalog = VoiceCatalog(pathlib.Path(directory) / "voices.json")
+            catalog.save(meta("a.Driver"), "pyttsx3")
+            catalog.save(meta("b.Driver"), "fake")
+            self.assertEqual(
+                catalog.load("1.0", "pyttsx3")["driver"],
+                "a.Driver")
+            self.assertEqual(catalog.load("1.0", "fake")["driver"], "b.Driver")
+            self.assertIsNone(catalog.load("1.0", "fake:audio=tone"))
+            self.assertIsNone(catalog.load("2.0", "fake"))
@@ -0,0 +1,38 @@
+import pathlib
+import tempfile
+import unittest
+
+from txt2dub.tts.cache import AudioCache
+from txt2dub.tts.engines import create_engine
+from txt2dub.tts.interpreter import Interpreter
+
+
+class FakeEngineTest(unittest.TestCase):
+    def test_options_change_driver(self):
+        drivers = {
+            create_engine(spec).driver
+                for spec
+                in (
+                    "fake",
+                    "fake:audio=tone",
+                    "fake:sample_rate=16000",
+                    "fake:audio=tone,sample_rate=16000",
+                )
+        }
+        self.assertEqual(len(drivers), 4)
+        self.assertEqual(
+            create_engine("fake:latency=0.5").driver,
+            create_engine("fake").driver)
+
+    def test_options_rerender(self):
+        line = {"text": "Hello there", "voice": {"id": "fake.mid", "rate": 200}}
+        with tempfile.TemporaryDirectory() as directory:
+            cache = AudioCache(pathlib.Path(directory) / "cache")
+            for spec, rendered in (
+                ("fake", 1,),
+                ("fake:latency=0", 0,),
+                ("fake:audio=tone", 1,),
+                ("fake:audio=tone,sample_rate=16000", 1,),
+            ):
+                interpreter = Interpreter("test", cache, create_engine(spec))
+                self.assertEqual(interpreter.render([line]), rendered, spec)
@@ -0,0 +1,24 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from txt2dub.tts.output import DirectoryOutput
+
+
+class DirectoryOutputTest(unittest.TestCase):
+    def test_copy_shared_sources(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            shared = directory / "cache"
+            shared.mkdir()
+            cached = shared / "cached.wav"
+            private = directory / "private.wav"
+            for source in (cached, private):
+                source.write_bytes(b"RIFF")
+            with DirectoryOutput(directory / "out", shared=shared) as output:
+                output.add("0000.wav", cached)
+                output.add("0001.wav", private)
+            out = directory / "out"
+            self.assertFalse(os.path.samefile(out / "0000.wav", cached))
+            self.assertTrue(os.path.samefile(out / "0001.wav", private))
@@ -1,3 +1,3 @@
-from .app import run
+from .cli import main
 
-run()
+main()
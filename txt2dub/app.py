@@ -1,5 +1,5 @@
+import asyncio
 import contextlib
-import json
 import re
 from textual import on, work
 from textual.app import App as TextualApp
@@ -7,8 +7,11 @@ from textual.containers import Container, Vertical
 from textual.events import Mount, Unmount
 from textual.message import Message
 from textual.reactive import var
-from textual.widgets import Button, Footer, Header, Static
-from .services.tts import create_tts
+from textual.widgets import Button, Footer, Header, Label, Static
+from .services.catalog import VoiceCatalog
+from .services.journal import ScriptJournal
+from .services.storage import ScriptLoader, load_script
+from .services.tts import create_tts, default_jobs
 from .screens.file import LoadScriptFileScreen
 from .screens.script import ScriptScreen
 from .models import ScriptModel
@@ -28,10 +31,13 @@ class AppActionsToolbar(Static):
     class Quit(Message):
         """Quit requested."""
 
+    status = var("")
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.new_button = None
         self.load_button = None
+        self.status_label = None
 
     def compose(self):
         with Container(classes="left group"):
@@ -51,6 +57,10 @@ class AppActionsToolbar(Static):
                     variant="primary"))
             yield self.load_button
 
+        with Container(classes="group"):
+            self.status_label = Label(self.status, classes="singular control")
+            yield self.status_label
+
         with Container(classes="right group"):
             yield(
                 Button(
@@ -76,6 +86,10 @@ class AppActionsToolbar(Static):
         if self.load_button is not None:
             self.load_button.disabled = self.disabled
 
+    def watch_status(self):
+        if self.status_label is not None:
+            self.status_label.update(self.status)
+
 
 class App(TextualApp):
     """A terminal UI application for editing voiceover scripts
@@ -90,10 +104,19 @@ class App(TextualApp):
         ("escape", "quit", "Quit")
     ]
 
+    TTS_STATUS = {
+        "starting": "Starting text to speech\N{HORIZONTAL ELLIPSIS}",
+        "ready": "",
+        "failed": "Text to speech is unavailable",
+    }
+
     disabled = var(False)
+    tts_state = var("starting")
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, jobs=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.jobs = jobs or default_jobs()
+        self.output = "stored"
         self.tts = None
         self.toolbar = None
 
@@ -113,6 +136,7 @@ class App(TextualApp):
             self.toolbar = (
                 AppActionsToolbar(
                     classes="bottom horizontal toolbar"))
+            self.toolbar.status = self.TTS_STATUS[self.tts_state]
             yield self.toolbar
 
         yield Footer()
@@ -120,8 +144,14 @@ class App(TextualApp):
     def play(self, text, voice, rate):
         return self.tts.play(text, voice, rate)
 
-    def generate(self, path, script):
-        return self.tts.generate(path, script)
+    def stop(self):
+        return self.tts.stop()
+
+    def prerender(self, lines):
+        return self.tts.prerender(lines)
+
+    def generate(self, path, script, progress=None, **options):
+        return self.tts.generate(path, script, progress=progress, **options)
 
     def push_screen(self, *args, **kwargs):
         results = super().push_screen(*args, **kwargs)
@@ -166,14 +196,32 @@ class App(TextualApp):
         if filename:
             async with self.disable():
                 meta = await self.tts.meta()
-                with open(filename, "r") as script:
+                journal = ScriptJournal(filename)
+                if journal.exists:
+                    def recover():
+                        script = load_script(filename, meta)
+                        return script, journal.replay(script)
+
+                    script, recovered = await (
+                        asyncio.get_running_loop().run_in_executor(
+                            None,
+                            recover))
+                    if not recovered:
+                        journal.discard()
+                    self.push_screen(
+                        ScriptScreen(
+                            filename,
+                            script,
+                            recovered=recovered,
+                            journal=journal))
+                else:
+                    loader = ScriptLoader(filename, meta)
                     self.push_screen(
                         ScriptScreen(
                             filename,
-                            ScriptModel.deserialize(
-                                json.loads(
-                                    script.read()),
-                                meta)))
+                            loader.script,
+                            loader=loader,
+                            journal=journal))
             name = (
                 " ".join(
                     re.split(
@@ -189,12 +237,30 @@ class App(TextualApp):
                     meta.voices[0].id,
                     175))
 
+    @work()
+    async def warm_up_tts(self):
+        """Starts the text-to-speech process and refreshes its voices in
+        the background, so they are ready when a script is opened. Voices
+        from the catalog of a previous session are only used once the
+        process has confirmed them."""
+
+        try:
+            await self.tts.refresh_meta()
+            self.tts_state = "ready"
+        except ValueError:
+            self.tts_state = "failed"
+
     @on(Mount)
     def app_mounted(self):
         def runner(worker):
             return self.run_worker(worker).wait
 
-        self.tts = create_tts(runner)
+        self.tts = (
+            create_tts(
+                runner,
+                jobs=self.jobs,
+                catalog=VoiceCatalog()))
+        self.warm_up_tts()
 
     @on(Unmount)
     async def app_unmounted(self):
@@ -220,6 +286,10 @@ class App(TextualApp):
         if self.toolbar is not None:
             self.toolbar.disabled = self.disabled
 
+    def watch_tts_state(self):
+        if self.toolbar is not None:
+            self.toolbar.status = self.TTS_STATUS[self.tts_state]
+
 
-def run():
-    App().run()
+def run(jobs=None):
+    App(jobs=jobs).run()
@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import signal
+import sys
+from .services.batch import SLOWEST, BatchRender, batch_paths
+from .services.catalog import VoiceCatalog
+from .services.service import QUEUE_SIZE, RenderService
+from .services.storage import load_script
+from .services.transport import service_address
+from .services.tts import create_tts
+from .tts.engines import ENGINES
+
+
+def positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return value
+
+
+def engine_spec(value):
+    name = value.partition(":")[0]
+    if name not in ENGINES:
+        raise (
+            argparse.ArgumentTypeError(
+                f"{name} is not an engine, choose from " \
+                f"{', '.join(ENGINES)}"))
+    return value
+
+
+def report(event, **fields):
+    """Prints an event as a line of JSON on standard output."""
+
+    print(
+        json.dumps(dict(event=event, **fields), separators=(",", ":")),
+        flush=True)
+
+
+def runner(coroutine):
+    """Runs `coroutine` in a task, returning a function for awaiting its
+    result, like the workers the app runs the text-to-speech interface
+    with."""
+
+    task = asyncio.ensure_future(coroutine)
+
+    async def wait():
+        return await task
+
+    return wait
+
+
+async def generate(script_path,
+                   path,
+                   jobs=None,
+                   mode="zip",
+                   compression="stored"):
+    """Generates the audio for the script at `script_path` to `path`
+    without the UI, reporting progress as lines of JSON. Returns whether
+    it succeeded."""
+
+    tts = create_tts(runner, jobs=jobs, catalog=VoiceCatalog())
+
+    def progress(progress, event):
+        report(
+            "progress",
+            phase=progress.phase,
+            rendered=len(progress.rendered),
+            done=len(progress.done),
+            total=progress.total,
+            throughput=round(progress.throughput, 3),
+            line=event)
+
+    try:
+        meta = await tts.meta()
+        try:
+            script = load_script(script_path, meta)
+        except (LookupError, TypeError, ValueError) as e:
+            raise ValueError(f"Can't load {script_path}: {e}")
+        report(
+            "start",
+            script=f"{script_path}",
+            path=f"{path}",
+            lines=len(script),
+            jobs=tts.jobs)
+        summary = (
+            await (
+                tts.generate(
+                    path,
+                    script,
+                    progress=progress,
+                    mode=mode,
+                    compression=compression)))
+        report("done", **summary)
+        return True
+    except (OSError, ValueError) as e:
+        report("error", message=f"{e}")
+        return False
+    finally:
+        await tts.terminate()
+
+
+async def batch(source,
+                output_dir=None,
+                jobs=None,
+                mode="zip",
+                compression="stored",
+                slowest=SLOWEST):
+    """Generates the audio for a batch of scripts, from a directory or a
+    manifest, on one pool of interpreters, reporting progress as lines of
+    JSON. Returns whether every script was generated."""
+
+    tts = create_tts(runner, jobs=jobs, catalog=VoiceCatalog())
+    try:
+        paths = batch_paths(source, output_dir)
+        report("start", source=f"{source}", scripts=len(paths), jobs=tts.jobs)
+        return (
+            await (
+                BatchRender(
+                    tts,
+                    paths,
+                    mode=mode,
+                    compression=compression,
+                    report=report,
+                    slowest=slowest).run()))
+    except (OSError, ValueError) as e:
+        report("error", message=f"{e}")
+        return False
+    finally:
+        await tts.terminate()
+
+
+async def serve(address, jobs=None, queue_size=QUEUE_SIZE):
+    """Runs the local render service at `address` until it's interrupted
+    or terminated. Returns whether it started."""
+
+    service = RenderService(address, jobs=jobs, queue_size=queue_size)
+    try:
+        await service.start()
+    except (OSError, ValueError) as e:
+        report("error", message=f"{e}")
+        await service.close()
+        return False
+    task = asyncio.ensure_future(service.serve_forever())
+    for signum in (signal.SIGINT, signal.SIGTERM,):
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signum, task.cancel)
+    report(
+        "listening",
+        address=f"{address}",
+        jobs=service.jobs,
+        queue=queue_size)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await service.close()
+    report("stopped")
+    return True
+
+
+def add_engine_argument(parser, default):
+    parser.add_argument(
+        "--engine",
+        type=engine_spec,
+        default=default,
+        help="the text-to-speech engine, pyttsx3 or fake, with options " \
+             "like fake:latency=0.05,audio=tone (default: " \
+             "$TXT2DUB_ENGINE or pyttsx3)")
+
+
+def add_output_arguments(parser):
+    add_engine_argument(parser, argparse.SUPPRESS)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=argparse.SUPPRESS,
+        help="the number of text-to-speech processes used for " \
+             "generating (default: the number of CPU cores)")
+    parser.add_argument(
+        "--compression",
+        choices=("stored", "deflated", "bzip2", "lzma",),
+        default="stored",
+        help="the zip compression method (default: %(default)s)")
+    parser.add_argument(
+        "--directory",
+        action="store_true",
+        help="write the audio files to a folder instead of a zip archive")
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="txt2dub",
+        description=(
+            "A text-based UI application for editing voiceover scripts " \
+            "and generating text to speech performances."))
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="the number of text-to-speech processes used for " \
+             "generating (default: the number of CPU cores)")
+    add_engine_argument(parser, None)
+    commands = parser.add_subparsers(dest="command")
+    generate_parser = (
+        commands.add_parser(
+            "generate",
+            help="generate the audio for a script without the UI",
+            description=(
+                "Generates the audio for a script without the UI, " \
+                "printing progress as lines of JSON, and exits with a " \
+                "non-zero status if it fails.")))
+    generate_parser.add_argument(
+        "script",
+        type=pathlib.Path,
+        help="the script file")
+    generate_parser.add_argument(
+        "output",
+        type=pathlib.Path,
+        help="the zip archive, or folder, to generate")
+    add_output_arguments(generate_parser)
+    batch_parser = (
+        commands.add_parser(
+            "batch",
+            help="generate the audio for many scripts without the UI",
+            description=(
+                "Generates the audio for every script in a folder, or " \
+                "listed in a manifest file, one path per line, on one " \
+                "pool of text-to-speech processes. Lines the scripts " \
+                "share are rendered once. Progress is printed as lines " \
+                "of JSON, ending with a summary of the throughput and " \
+                "the slowest lines, and it exits with a non-zero status " \
+                "if any script fails.")))
+    batch_parser.add_argument(
+        "source",
+        type=pathlib.Path,
+        help="a folder of scripts, or a manifest file")
+    batch_parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=pathlib.Path,
+        default=None,
+        help="the folder to generate into (default: beside each script)")
+    batch_parser.add_argument(
+        "--slowest",
+        type=int,
+        default=SLOWEST,
+        help="the number of slowest lines to report (default: %(default)s)")
+    add_output_arguments(batch_parser)
+    serve_parser = (
+        commands.add_parser(
+            "serve",
+            help="run the local render service",
+            description=(
+                "Runs a render service sharing one pool of warm " \
+                "text-to-speech processes between every txt2dub on this " \
+                "machine. txt2dub connects to it when it's running at " \
+                "TXT2DUB_RENDER_SERVICE, or at render.sock in the cache " \
+                "folder, and starts its own processes otherwise.")))
+    serve_parser.add_argument(
+        "--address",
+        default=service_address(),
+        help="the Unix socket path to listen on (default: %(default)s)")
+    serve_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=argparse.SUPPRESS,
+        help="the number of text-to-speech processes (default: the " \
+             "number of CPU cores)")
+    serve_parser.add_argument(
+        "--queue-size",
+        type=positive_int,
+        default=QUEUE_SIZE,
+        help="the number of requests that can wait for a process before " \
+             "clients have to wait to send more (default: %(default)s)")
+    add_engine_argument(serve_parser, argparse.SUPPRESS)
+    args = parser.parse_args(args)
+    if args.engine is not None:
+        os.environ["TXT2DUB_ENGINE"] = args.engine
+    if args.command == "serve":
+        if args.address is None:
+            parser.error("no address to listen on")
+        try:
+            succeeded = (
+                asyncio.run(
+                    serve(
+                        args.address,
+                        jobs=args.jobs,
+                        queue_size=args.queue_size)))
+        except KeyboardInterrupt:
+            succeeded = True
+        sys.exit(
+            0
+                if succeeded
+                else 1)
+    elif args.command in ("generate", "batch",):
+        mode = (
+            "directory"
+                if args.directory
+                else "zip")
+        succeeded = (
+            asyncio.run(
+                generate(
+                    args.script,
+                    args.output,
+                    jobs=args.jobs,
+                    mode=mode,
+                    compression=args.compression)
+                    if args.command == "generate"
+                    else batch(
+                        args.source,
+                        args.output_dir,
+                        jobs=args.jobs,
+                        mode=mode,
+                        compression=args.compression,
+                        slowest=args.slowest)))
+        sys.exit(
+            0
+                if succeeded
+                else 1)
+    else:
+        from .app import run
+        run(jobs=args.jobs)
@@ -2,6 +2,8 @@
 class Model(object):
     """Base class for models."""
 
+    __slots__ = ("_context",)
+
     @property
     def context(self):
         """Application context can be stored in the model, e.g.
@@ -0,0 +1,224 @@
+import random
+
+
+class PositionNode(object):
+    """A node of a `PositionIndex`, holding one item."""
+
+    __slots__ = ("item", "priority", "size", "left", "right", "parent",)
+
+    def __init__(self, item, priority):
+        self.item = item
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+        self.parent = None
+
+    def update(self):
+        self.size = 1 + size_of(self.left) + size_of(self.right)
+        if self.left is not None:
+            self.left.parent = self
+        if self.right is not None:
+            self.right.parent = self
+        return self
+
+
+def size_of(node):
+    return (
+        node.size
+            if node is not None
+            else 0)
+
+
+class PositionIndex(object):
+    """An ordered sequence of items with positional access.
+
+    Items are kept in an implicit treap: a binary tree ordered by position,
+    balanced by random priorities, where each node knows the size of its
+    subtree and its parent. Inserting, removing, finding the item at a
+    position and finding the position of an item all take O(log n)
+    expected time.
+
+    Items keep their node in an `index_node` attribute, which is `None`
+    while they aren't in an index, so no lookup table is needed.
+    """
+
+    def __init__(self, items=()):
+        """Create a position index holding `items`, in order, which is
+        built in O(n) time."""
+
+        self.root = self.build(items)
+
+    def __len__(self):
+        return size_of(self.root)
+
+    def __contains__(self, item):
+        return self.node(item) is not None
+
+    def node(self, item):
+        """Returns the node of `item`, or `None` if it isn't in this
+        index."""
+
+        node = getattr(item, "index_node", None)
+        if node is None:
+            return None
+        root = node
+        while root.parent is not None:
+            root = root.parent
+        return (
+            node
+                if root is self.root
+                else None)
+
+    def __iter__(self):
+        return self.walk(self.root)
+
+    @staticmethod
+    def walk(node):
+        """Yields the items of the subtree at `node`, in order."""
+
+        stack = []
+        while stack or node is not None:
+            if node is not None:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node.item
+                node = node.right
+
+    def build(self, items):
+        """Builds a treap of `items` from left to right, keeping the
+        rightmost path on a stack."""
+
+        stack = []
+        for item in items:
+            node = PositionNode(item, random.random())
+            item.index_node = node
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if last is not None:
+                last.parent = node
+            if stack:
+                stack[-1].right = node
+                node.parent = stack[-1]
+            stack.append(node)
+        if not stack:
+            return None
+        root = stack[0]
+        root.parent = None
+        pending = [(root, False)]
+        while pending:
+            node, visited = pending.pop()
+            if visited:
+                node.update()
+            else:
+                pending.append((node, True))
+                for child in (node.left, node.right):
+                    if child is not None:
+                        pending.append((child, False))
+        return root
+
+    def split(self, node, n):
+        """Splits the subtree at `node` into the first `n` items and the
+        rest."""
+
+        if node is None:
+            return None, None
+        if size_of(node.left) >= n:
+            left, node.left = self.split(node.left, n)
+            if left is not None:
+                left.parent = None
+            return left, node.update()
+        else:
+            node.right, right = (
+                self.split(node.right, n - size_of(node.left) - 1))
+            if right is not None:
+                right.parent = None
+            return node.update(), right
+
+    def merge(self, left, right):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = self.merge(left.right, right)
+            return left.update()
+        else:
+            right.left = self.merge(left, right.left)
+            return right.update()
+
+    def insert(self, n, item):
+        """Inserts `item` at position `n`."""
+
+        if getattr(item, "index_node", None) is not None:
+            raise ValueError("Item is already in an index")
+        node = PositionNode(item, random.random())
+        item.index_node = node
+        left, right = self.split(self.root, n)
+        self.root = self.merge(self.merge(left, node), right)
+        self.root.parent = None
+
+    def insert_all(self, n, items):
+        """Inserts `items`, in order, at position `n`, in time linear in
+        the number of items."""
+
+        left, right = self.split(self.root, n)
+        self.root = self.merge(self.merge(left, self.build(items)), right)
+        if self.root is not None:
+            self.root.parent = None
+
+    def remove_all(self, start, stop):
+        """Removes the items from position `start` up to, but not including,
+        position `stop`, in time linear in the number of items."""
+
+        left, rest = self.split(self.root, start)
+        middle, right = self.split(rest, stop - start)
+        self.root = self.merge(left, right)
+        if self.root is not None:
+            self.root.parent = None
+        for item in self.walk(middle):
+            item.index_node = None
+
+    def remove(self, item):
+        n = self.position(item)
+        left, rest = self.split(self.root, n)
+        _, right = self.split(rest, 1)
+        self.root = self.merge(left, right)
+        if self.root is not None:
+            self.root.parent = None
+        item.index_node = None
+
+    def position(self, item):
+        """Returns the position of `item`, counting from 0."""
+
+        node = getattr(item, "index_node", None)
+        if node is None:
+            raise ValueError("Item is not in an index")
+        n = size_of(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                n += size_of(node.parent.left) + 1
+            node = node.parent
+        if node is not self.root:
+            raise ValueError("Item is not in this index")
+        return n
+
+    def at(self, n):
+        """Returns the item at position `n`, counting from 0."""
+
+        if n < 0 or n >= len(self):
+            raise IndexError("Position is out of range")
+        node = self.root
+        while True:
+            left = size_of(node.left)
+            if n < left:
+                node = node.left
+            elif n == left:
+                return node.item
+            else:
+                n -= left + 1
+                node = node.right
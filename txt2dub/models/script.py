@@ -1,5 +1,8 @@
+import itertools
 import re
+import sys
 from .base import Model
+from .index import PositionIndex
 
 
 rx_ms_name = re.compile(r"^Microsoft\s+(?P<name>[^\s]+)")
@@ -32,14 +35,33 @@ class ScriptMetadata(object):
         `voices`
             a list of `ScriptVoiceMetadata` for voices available
             from the driver
+
+        The voice options for selectors and the voice names by id are
+        built once here and shared by every line of the script.
         """
         self.version = version
         self.driver = driver
         self.voices = voices
+        self.voice_options = tuple(
+            (voice.name, voice.id)
+                for voice
+                in voices)
+        self.voice_names = {
+            voice.id: voice.name
+                for voice
+                in voices
+        }
 
 
 class ScriptVoiceModel(Model):
-    """The model for the voice used in one line of a script."""
+    """The model for the voice used in lines of a script.
+
+    Voices are shared by all the lines of a script with the same settings,
+    so they are never changed. Lines switch to another shared voice with
+    `ScriptLineModel.edit_voice` instead.
+    """
+
+    __slots__ = ("script", "id", "rate",)
 
     def __init__(self, script, id, rate):
         """Create a script voice.
@@ -56,9 +78,19 @@ class ScriptVoiceModel(Model):
         self.id = id
         self.rate = rate
 
+    @classmethod
+    def intern(cls, script, id, rate):
+        """Returns the voice of `script` shared by lines with `id` and
+        `rate`."""
+
+        voice = script.voice_pool.get((id, rate))
+        if voice is None:
+            voice = script.voice_pool[(id, rate)] = cls(script, id, rate)
+        return voice
+
     def clone(self, id=None, rate=None):
         return (
-            self.__class__(
+            self.intern(
                 self.script,
                 id
                     if id is not None
@@ -75,23 +107,29 @@ class ScriptVoiceModel(Model):
 
     @classmethod
     def new(cls, script):
-        return cls(script, script.meta.voices[0].id, 200)
+        return cls.intern(script, script.meta.voices[0].id, 200)
 
     @classmethod
     def deserialize(cls, script, data):
+        voice = script.voice_pool.get((data["id"], data["rate"]))
+        if voice is not None:
+            return voice
         return (
-            cls(script,
+            cls.intern(
+                script,
                 data["id"]
-                    if any(
-                        data["id"] == voice.id
-                            for voice
-                            in script.meta.voices)
+                    if data["id"] in script.meta.voice_names
                     else script.meta.voices[0].id,
                 data["rate"]))
 
 
 class ScriptLineModel(Model):
-    """The model for one line of a script."""
+    """The model for one line of a script.
+
+    Line text is interned, so lines with the same text share one string.
+    """
+
+    __slots__ = ("script", "_text", "voice", "prev", "next", "index_node",)
 
     def __init__(self, script, text, voice):
         """Create a script line.
@@ -109,6 +147,7 @@ class ScriptLineModel(Model):
         self.voice = voice
         self.prev = None
         self.next = None
+        self.index_node = None
 
     def __iter__(self):
         line = self
@@ -116,6 +155,23 @@ class ScriptLineModel(Model):
             yield line
             line = line.next
 
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = sys.intern(text)
+        self.script.record(self, "text", self._text)
+
+    def edit_voice(self, id=None, rate=None):
+        """Switches this line to the shared voice with a different `id` or
+        `rate`, leaving the current voice unchanged for other lines."""
+
+        self.voice = self.voice.clone(id=id, rate=rate)
+        self.script.record(self, "voice", self.voice.serialize())
+        return self.voice
+
     def clone(self, text=None, voice=None):
         return (
             self.__class__(
@@ -125,7 +181,7 @@ class ScriptLineModel(Model):
                     else self.text,
                 voice
                     if voice is not None
-                    else self.voice.clone()))
+                    else self.voice))
 
     def link(self, prev, next):
         """Link a script line.
@@ -166,6 +222,8 @@ class ScriptLineModel(Model):
 class ScriptModel(Model):
     """The model for a script."""
 
+    __slots__ = ("meta", "head", "tail", "positions", "voice_pool", "journal",)
+
     def __init__(self, meta):
         """Create a script.
 
@@ -176,6 +234,9 @@ class ScriptModel(Model):
         self.meta = meta
         self.head = None
         self.tail = None
+        self.positions = PositionIndex()
+        self.voice_pool = {}
+        self.journal = None
 
     def __iter__(self):
         line = self.head
@@ -183,6 +244,54 @@ class ScriptModel(Model):
             yield line
             line = line.next
 
+    def __len__(self):
+        return len(self.positions)
+
+    def contains(self, line):
+        """Returns whether `line` is currently part of this script."""
+
+        return line in self.positions
+
+    def index(self, line):
+        """Returns the position of `line` in this script, counting from 0,
+        in O(log n) time."""
+
+        return self.positions.position(line)
+
+    def line_at(self, n):
+        """Returns the line at position `n`, counting from 0, in O(log n)
+        time."""
+
+        return self.positions.at(n)
+
+    def lines(self, start, stop):
+        """Returns an iterator over the lines from position `start` up to,
+        but not including, position `stop`."""
+
+        start = max(start, 0)
+        stop = min(stop, len(self))
+        if start >= stop:
+            return iter(())
+        return itertools.islice(self.line_at(start), stop - start)
+
+    def between(self, first, last):
+        """Returns an iterator over the lines from `first` to `last`,
+        inclusive, in script order whichever comes first."""
+
+        start = self.index(first)
+        stop = self.index(last)
+        return (
+            self.lines(start, stop + 1)
+                if start <= stop
+                else self.lines(stop, start + 1))
+
+    def record(self, line, op, *args):
+        """Records an edit of `line` in the journal, if there is one and the
+        line is part of this script, by its position."""
+
+        if self.journal is not None and self.contains(line):
+            self.journal.record(op, self.index(line), *args)
+
     def serialize(self):
         return {
             "version": self.meta.version,
@@ -201,26 +310,134 @@ class ScriptModel(Model):
 
     def add(self, line, after=None, before=None):
         if after is None and before is None:
+            self.positions.insert(len(self), line)
             if self.head is None:
                 self.head = line
             self.tail = line.link(self.tail, None)
-            return line
         elif after is not None:
+            self.positions.insert(self.index(after) + 1, line)
             if after is self.tail:
                 self.tail = line.link(self.tail, None)
-                return line
             else:
-                return line.link(after, after.next)
+                line.link(after, after.next)
         elif before is not None:
+            self.positions.insert(self.index(before), line)
             if before is self.head:
                 self.head = line.link(None, self.head)
-                return line
             else:
-                return line.link(before.prev, before)
+                line.link(before.prev, before)
         else:
             raise (
                 ValueError(
                     "Only one of `after` or `before` may be passed"))
+        if self.journal is not None:
+            self.journal.record("insert", self.index(line), [line.serialize()])
+        return line
+
+    def build(self, texts, voice):
+        """Returns the first and last of new lines for `texts` with `voice`,
+        linked to each other but not yet added to this script, or `None`
+        for both if there are no texts."""
+
+        return (
+            self.link_all(
+                ScriptLineModel(self, text, voice)
+                    for text
+                    in texts))
+
+    def load(self, lines):
+        """Returns the first and last of new lines deserialized from
+        `lines`, linked like `build`."""
+
+        return (
+            self.link_all(
+                ScriptLineModel.deserialize(self, line)
+                    for line
+                    in lines))
+
+    @staticmethod
+    def link_all(lines):
+        first = last = None
+        for line in lines:
+            if first is None:
+                first = line
+            else:
+                line.prev = last
+                last.next = line
+            last = line
+        return first, last
+
+    def splice(self, first, last, after=None, before=None):
+        """Adds the lines from `first` to `last`, which are linked to each
+        other, after `after`, before `before` or else at the end of this
+        script, in time linear in the number of lines."""
+
+        if before is not None:
+            after = before.prev
+            next = before
+        else:
+            if after is None:
+                after = self.tail
+            next = (
+                after.next
+                    if after is not None
+                    else self.head)
+        n = (
+            self.index(after) + 1
+                if after is not None
+                else 0)
+        first.prev = after
+        last.next = next
+        if after is None:
+            self.head = first
+        else:
+            after.next = first
+        if next is None:
+            self.tail = last
+        else:
+            next.prev = last
+        self.positions.insert_all(n, self.chain(first, last))
+        if self.journal is not None:
+            self.journal.record(
+                "insert",
+                n,
+                [line.serialize() for line in self.chain(first, last)])
+
+    def cut(self, first, last):
+        """Removes the lines from `first` to `last`, keeping them linked to
+        each other, and returns the lines that were before and after them.
+        """
+
+        start = self.index(first)
+        stop = self.index(last) + 1
+        prev = first.prev
+        next = last.next
+        if prev is None:
+            self.head = next
+        else:
+            prev.next = next
+        if next is None:
+            self.tail = prev
+        else:
+            next.prev = prev
+        first.prev = None
+        last.next = None
+        if self.journal is not None:
+            self.journal.record("delete", start, stop)
+        self.positions.remove_all(start, stop)
+        return (prev, next)
+
+    @staticmethod
+    def chain(first, last):
+        """Yields the lines from `first` to `last`, following their links.
+        """
+
+        line = first
+        while True:
+            yield line
+            if line is last:
+                return
+            line = line.next
 
     def remove(self, line):
         prev = line.prev
@@ -234,12 +451,17 @@ class ScriptModel(Model):
         else:
             line.next.prev = line.prev
         line.link(None, None)
+        if self.journal is not None:
+            n = self.index(line)
+            self.journal.record("delete", n, n + 1)
+        self.positions.remove(line)
         return (prev, next)
 
     @classmethod
     def new(cls, meta):
         script = cls(meta)
         script.head = script.tail = ScriptLineModel.new(script)
+        script.positions = PositionIndex((script.head,))
         return script
 
     @classmethod
@@ -256,4 +478,5 @@ class ScriptModel(Model):
             if script.head is None:
                 script.head = line
             script.tail = line.link(script.tail, None)
+        script.positions = PositionIndex(script)
         return script
@@ -1,10 +1,12 @@
 from .screen import (
+    ImportScriptFileScreen,
     LoadScriptFileScreen,
     SaveGeneratedFileScreen,
     SaveScriptFileScreen,
     SaveBeforeClosingScreen,)
 
 __all__ = (
+    "ImportScriptFileScreen",
     "LoadScriptFileScreen",
     "SaveGeneratedFileScreen",
     "SaveScriptFileScreen",
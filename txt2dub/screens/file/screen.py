@@ -5,13 +5,12 @@ from textual.containers import Container, Grid
 from textual.events import Mount
 from textual.message import Message
 from textual.reactive import var
-from textual.widgets import Button, Footer, Header, Input, Label, Static
+from textual.widgets import (
+    Button, Footer, Header, Input, Label, Select, Static,)
+from ...services.importer import IMPORT_SUFFIXES
+from ...services.storage import GENERATED_SUFFIXES, SCRIPT_SUFFIXES
 from ...widgets.base import TitledScreen, TitledModalScreen
-from .widgets import ScriptDirectoryTree
-
-
-SCRIPT_SUFFIXES = (".txt2dub", ".json",)
-GENERATED_SUFFIXES = (".txt2dub", ".zip",)
+from .widgets import ImportDirectoryTree, ScriptDirectoryTree
 
 
 class LoadFileScreenToolbar(Static):
@@ -64,15 +63,185 @@ class LoadScriptFileScreen(TitledScreen):
         self.app.pop_screen()
 
 
+class ImportFileScreenToolbar(Static):
+    """The toolbar for the file importing screen."""
+
+    MIN_RATE = 25
+    MAX_RATE = 500
+    SPLITS = [
+        ("Sentences", "sentences"),
+        ("Paragraphs", "paragraphs"),
+    ]
+
+    class Import(Message):
+        """Import requested."""
+
+        def __init__(self, path, options=None, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.path = path
+            self.options = options or {}
+
+    class Cancel(Message):
+        """Cancel requested."""
+
+    path = var(None)
+
+    def __init__(self, voice_options, voice_id, voice_rate, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.voice_options = voice_options
+        self.voice_id = voice_id
+        self.voice_rate = voice_rate
+        self.label = None
+        self.split_select = None
+        self.voice_id_select = None
+        self.voice_rate_input = None
+        self.import_button = None
+
+    def compose(self):
+        with Container(classes="singular group"):
+            self.label = Label("", classes="first control")
+            yield self.label
+
+            self.split_select = (
+                Select(
+                    self.SPLITS,
+                    id="split",
+                    prompt="Split",
+                    allow_blank=False,
+                    value="sentences",
+                    classes="control"))
+            yield self.split_select
+
+            self.voice_id_select = (
+                Select(
+                    self.voice_options,
+                    id="voice",
+                    prompt="Voice",
+                    allow_blank=False,
+                    value=self.voice_id,
+                    classes="control"))
+            yield self.voice_id_select
+
+            self.voice_rate_input = (
+                Input(
+                    value=f"{self.voice_rate}",
+                    id="rate",
+                    classes="narrow control"))
+            yield self.voice_rate_input
+
+            self.import_button = (
+                Button(
+                    "Import",
+                    id="import",
+                    classes="control",
+                    variant="primary",
+                    disabled=True))
+            yield self.import_button
+
+        with Container(classes="right group"):
+            yield (
+                Button(
+                    "Cancel",
+                    id="cancel",
+                    classes="singular control"))
+
+    @property
+    def options(self):
+        rate = self.voice_rate
+        try:
+            if (int(self.voice_rate_input.value) >= self.MIN_RATE and
+                int(self.voice_rate_input.value) <= self.MAX_RATE):
+
+                rate = int(self.voice_rate_input.value)
+        except (AttributeError, ValueError):
+            pass
+        return {
+            "split": self.split_select.value or "sentences",
+            "voice_id": self.voice_id_select.value or self.voice_id,
+            "voice_rate": rate,
+        }
+
+    @on(Button.Pressed, "#import")
+    def import_pressed(self):
+        if self.path is not None:
+            self.post_message(
+                self.Import(self.path, self.options))
+
+    @on(Button.Pressed, "#cancel")
+    def cancel_pressed(self):
+        self.post_message(
+            self.Cancel())
+
+    def watch_path(self, path):
+        if self.label:
+            self.label.update(
+                path.name
+                    if path is not None
+                    else "")
+        if self.import_button:
+            self.import_button.disabled = path is None
+
+
+class ImportScriptFileScreen(TitledScreen):
+    """The screen for importing lines into a script from a plain text,
+    SubRip subtitles or Markdown file."""
+
+    TITLE = "Select a file to import"
+    BINDINGS = [("escape", "cancel", "Cancel")]
+
+    def __init__(self, voice_options, voice_id, voice_rate, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.voice_options = voice_options
+        self.voice_id = voice_id
+        self.voice_rate = voice_rate
+        self.directory_tree = None
+        self.toolbar = None
+
+    def compose(self):
+        yield Header()
+        with Container(classes="container"):
+            self.directory_tree = (
+                ImportDirectoryTree(
+                    ".",
+                    IMPORT_SUFFIXES,
+                    classes="tree"))
+            yield self.directory_tree
+
+            self.toolbar = (
+                ImportFileScreenToolbar(
+                    self.voice_options,
+                    self.voice_id,
+                    self.voice_rate,
+                    classes="bottom horizontal toolbar"))
+            yield self.toolbar
+        yield Footer()
+
+    @on(ImportDirectoryTree.FileSelected)
+    def file_selected(self, event):
+        self.toolbar.path = event.path
+
+    @on(ImportFileScreenToolbar.Import)
+    def toolbar_import(self, event):
+        self.dismiss(event)
+
+    @on(ImportFileScreenToolbar.Cancel)
+    def toolbar_cancel(self):
+        self.app.pop_screen()
+
+    def action_cancel(self):
+        self.app.pop_screen()
+
+
 class SaveFileScreenToolbar(Static):
     """The toolbar for the file saving screen."""
 
     class Save(Message):
         """Save requested."""
 
-        def __init__(self, path, *args, **kwargs):
+        def __init__(self, path, options=None, *args, **kwargs):
             super().__init__(*args, **kwargs)
             self.path = path
+            self.options = options or {}
 
     class Cancel(Message):
         """Cancel requested."""
@@ -96,6 +265,8 @@ class SaveFileScreenToolbar(Static):
             self.input = Input(id="filename", classes="wide control")
             yield self.input
 
+            yield from self.compose_options()
+
             self.save_button = (
                 Button(
                     "Save",
@@ -111,6 +282,15 @@ class SaveFileScreenToolbar(Static):
                     id="cancel",
                     classes="singular control"))
 
+    def compose_options(self):
+        """Yields extra option controls placed before the save button."""
+
+        return ()
+
+    @property
+    def options(self):
+        return {}
+
     @property
     def path(self):
         if self.directory and self.filename:
@@ -140,14 +320,14 @@ class SaveFileScreenToolbar(Static):
         if path is not None:
             print("um", path)
             self.post_message(
-                self.Save(path))
+                self.Save(path, self.options))
 
     @on(Button.Pressed, "#save")
     def save_pressed(self):
         path = self.path
         if path is not None:
             self.post_message(
-                self.Save(path))
+                self.Save(path, self.options))
 
     @on(Button.Pressed, "#cancel")
     def cancel_pressed(self):
@@ -169,6 +349,70 @@ class SaveFileScreenToolbar(Static):
                     else "")
 
 
+class SaveGeneratedFileScreenToolbar(SaveFileScreenToolbar):
+    """The toolbar for the generated file saving screen."""
+
+    OUTPUTS = [
+        ("Zip", "stored"),
+        ("Zip, deflated", "deflated"),
+        ("Folder", "directory"),
+    ]
+
+    def __init__(self, jobs, output, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = jobs
+        self.output = output
+        self.jobs_input = None
+        self.output_select = None
+
+    def compose_options(self):
+        yield Label("Jobs", classes="control")
+
+        self.jobs_input = (
+            Input(
+                value=f"{self.jobs}",
+                id="jobs",
+                classes="narrow control"))
+        yield self.jobs_input
+
+        self.output_select = (
+            Select(
+                self.OUTPUTS,
+                id="output",
+                prompt="Output",
+                allow_blank=False,
+                value=self.output,
+                classes="control"))
+        yield self.output_select
+
+    @property
+    def options(self):
+        jobs = self.jobs
+        try:
+            if int(self.jobs_input.value) >= 1:
+                jobs = int(self.jobs_input.value)
+        except (AttributeError, ValueError):
+            pass
+        output = (
+            self.output_select.value
+                if self.output_select is not None and
+                    self.output_select.value is not None
+                else self.output)
+        return (
+            {
+                "jobs": jobs,
+                "output": output,
+                "mode": "directory",
+            }
+                if output == "directory"
+                else {
+                    "jobs": jobs,
+                    "output": output,
+                    "mode": "zip",
+                    "compression": output,
+                })
+
+
 class SaveFileScreen(TitledScreen):
     """The base file saving screen."""
 
@@ -179,6 +423,7 @@ class SaveFileScreen(TitledScreen):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.directory_tree = None
+        self.toolbar = None
 
     def compose(self):
         yield Header()
@@ -189,13 +434,16 @@ class SaveFileScreen(TitledScreen):
                     self.SUFFIXES,classes="tree"))
             yield self.directory_tree
 
-            self.toolbar = (
-                SaveFileScreenToolbar(
-                    self.SUFFIXES,
-                    classes="bottom horizontal toolbar"))
+            self.toolbar = self.create_toolbar()
             yield self.toolbar
         yield Footer()
 
+    def create_toolbar(self):
+        return (
+            SaveFileScreenToolbar(
+                self.SUFFIXES,
+                classes="bottom horizontal toolbar"))
+
     @on(Mount)
     def on_mount(self):
         if self.directory_tree is not None and self.toolbar is not None:
@@ -237,6 +485,19 @@ class SaveGeneratedFileScreen(SaveFileScreen):
     TITLE = "Save a generated file as..."
     SUFFIXES = GENERATED_SUFFIXES
 
+    def __init__(self, jobs, output="stored", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = jobs
+        self.output = output
+
+    def create_toolbar(self):
+        return (
+            SaveGeneratedFileScreenToolbar(
+                self.jobs,
+                self.output,
+                self.SUFFIXES,
+                classes="bottom horizontal toolbar"))
+
 
 class SaveBeforeClosingScreen(TitledModalScreen):
     """Save before closing screen."""
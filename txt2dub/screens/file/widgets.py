@@ -22,13 +22,16 @@ class ScriptDirectoryTree(DirectoryTree):
             if not path.name.startswith("."):
                 if path.is_dir():
                     yield path
-                elif path.is_file():
-                    suffixes = path.suffixes[-len(self.suffixes):]
-                    if (len(suffixes) == len(self.suffixes) and
-                        all(suffix == check
-                                for suffix, check
-                                in zip(suffixes, self.suffixes))):
-                        yield path
+                elif path.is_file() and self.matches(path):
+                    yield path
+
+    def matches(self, path):
+        suffixes = path.suffixes[-len(self.suffixes):]
+        return (
+            len(suffixes) == len(self.suffixes) and
+            all(suffix == check
+                    for suffix, check
+                    in zip(suffixes, self.suffixes)))
 
     @on(DirectoryTree.NodeSelected)
     def node_selected(self, event):
@@ -37,3 +40,11 @@ class ScriptDirectoryTree(DirectoryTree):
             self.post_message(
                 self.DirectorySelected(
                     data.path))
+
+
+class ImportDirectoryTree(ScriptDirectoryTree):
+    """A directory tree for selecting a file to import, with any one of
+    the suffixes."""
+
+    def matches(self, path):
+        return path.suffix.lower() in self.suffixes
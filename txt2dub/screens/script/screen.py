@@ -1,16 +1,23 @@
+import asyncio
+import collections
 import contextlib
-import json
 from textual import on
 from textual.containers import (
-        Container, Horizontal, Vertical, VerticalScroll,)
-from textual.events import Mount
+        Container, Horizontal, Vertical,)
+from textual.events import Mount, Unmount
 from textual.message import Message
 from textual.reactive import var
 from textual.worker import Worker, WorkerState
-from textual.widgets import Button, Footer, Header, Static
+from textual.widgets import (
+    Button, Footer, Header, Input, Label, ProgressBar, Static,)
+from ...models.script import ScriptLineModel, ScriptVoiceModel
 from ...services.actions import Actions, ActionsManager
+from ...services import storage
+from ...services.importer import import_texts
+from ...services.journal import ScriptJournal
 from ...widgets.base import TitledScreen
 from ..file import (
+    ImportScriptFileScreen,
     SaveBeforeClosingScreen,
     SaveScriptFileScreen,
     SaveGeneratedFileScreen,)
@@ -19,7 +26,10 @@ from .messages import (
     ScriptEditLineVoiceRate, ScriptEditLineVoiceId,
     ScriptMoveLineUp, ScriptMoveLineDown,
     ScriptRemoveLine, ScriptAddLineAbove, ScriptAddLineBelow,)
-from .widgets import ScriptLine
+from .widgets import ScriptLineList
+
+
+PLAY_AHEAD = 3
 
 
 class ScriptScreenActionsToolbar(Static):
@@ -37,6 +47,13 @@ class ScriptScreenActionsToolbar(Static):
     class Last(Message):
         """Last line requested."""
 
+    class GoTo(Message):
+        """Line number requested."""
+
+        def __init__(self, number, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.number = number
+
     class Play(Message):
         """Play lines requested."""
 
@@ -47,6 +64,7 @@ class ScriptScreenActionsToolbar(Static):
     redo_disabled = var(True)
     stop_disabled = var(True)
     play_disabled = var(False)
+    line_number = var(None)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -54,6 +72,7 @@ class ScriptScreenActionsToolbar(Static):
         self.redo_button = None
         self.stop_button = None
         self.play_button = None
+        self.line_number_input = None
 
     def compose(self):
         with Container(classes="group"):
@@ -102,6 +121,14 @@ class ScriptScreenActionsToolbar(Static):
                     id="last",
                     classes="last control"))
 
+        with Container(classes="group"):
+            self.line_number_input = (
+                Input(
+                    id="line-number",
+                    placeholder="Line",
+                    classes="narrow control"))
+            yield self.line_number_input
+
     @on(Button.Pressed, "#undo")
     def undo_pressed(self):
         self.post_message(self.Undo())
@@ -118,6 +145,12 @@ class ScriptScreenActionsToolbar(Static):
     def last_pressed(self):
         self.post_message(self.Last())
 
+    @on(Input.Submitted, "#line-number")
+    def line_number_submitted(self, event):
+        with contextlib.suppress(ValueError):
+            self.post_message(self.GoTo(int(event.value)))
+        self.watch_line_number()
+
     @on(Button.Pressed, "#stop")
     def stop_pressed(self):
         self.post_message(self.Stop())
@@ -142,11 +175,19 @@ class ScriptScreenActionsToolbar(Static):
         if self.play_button is not None:
             self.play_button.disabled = self.play_disabled
 
+    def watch_line_number(self):
+        if self.line_number_input is not None:
+            self.line_number_input.value = (
+                f"{self.line_number}"
+                    if self.line_number is not None
+                    else "")
+
 
 class ScriptScreenFileToolbar(Static):
     """The toolbar for file operations on the script editing screen."""
 
     save_disabled = var(True)
+    generating = var(False)
 
     class Save(Message):
         """Save requested."""
@@ -154,6 +195,9 @@ class ScriptScreenFileToolbar(Static):
     class SaveAs(Message):
         """Save as requested."""
 
+    class Import(Message):
+        """Import requested."""
+
     class Generate(Message):
         """Generate requested."""
 
@@ -164,7 +208,11 @@ class ScriptScreenFileToolbar(Static):
         super().__init__(*args, **kwargs)
         self.save_button = None
         self.save_as_button = None
+        self.import_button = None
         self.generate_button = None
+        self.progress_group = None
+        self.progress_bar = None
+        self.progress_label = None
 
     def compose(self):
         with Horizontal(classes="left group"):
@@ -185,6 +233,14 @@ class ScriptScreenFileToolbar(Static):
                     variant="primary"))
             yield self.save_as_button
 
+            self.import_button = (
+                Button(
+                    "Import\N{HORIZONTAL ELLIPSIS}",
+                    id="import",
+                    classes="control",
+                    variant="primary"))
+            yield self.import_button
+
             self.generate_button = (
                 Button(
                     "Generate\N{HORIZONTAL ELLIPSIS}",
@@ -193,6 +249,16 @@ class ScriptScreenFileToolbar(Static):
                     variant="warning"))
             yield self.generate_button
 
+        self.progress_group = Horizontal(classes="group progress")
+        with self.progress_group:
+            self.progress_bar = (
+                ProgressBar(
+                    classes="first control"))
+            yield self.progress_bar
+
+            self.progress_label = Label("", classes="last control")
+            yield self.progress_label
+
         with Horizontal(classes="right group"):
             yield (
                 Button(
@@ -208,6 +274,10 @@ class ScriptScreenFileToolbar(Static):
     def save_as_pressed(self):
         self.post_message(self.SaveAs())
 
+    @on(Button.Pressed, "#import")
+    def import_pressed(self):
+        self.post_message(self.Import())
+
     @on(Button.Pressed, "#generate")
     def generate_pressed(self):
         self.post_message(self.Generate())
@@ -219,6 +289,111 @@ class ScriptScreenFileToolbar(Static):
     def watch_save_disabled(self):
         self.save_button.disabled = self.save_disabled
 
+    def watch_generating(self):
+        if self.generate_button is not None:
+            self.generate_button.disabled = self.generating
+        if self.progress_group is not None:
+            self.progress_group.display = self.generating
+
+    def update_progress(self, progress):
+        """Shows the progress of a generate job, from a
+        `GenerateProgress`."""
+
+        if progress.phase == "render":
+            self.progress_bar.update(
+                total=progress.rendering,
+                progress=len(progress.rendered))
+            self.progress_label.update(
+                f"Rendering {len(progress.rendered)}/{progress.rendering} " \
+                "lines")
+        else:
+            self.progress_bar.update(
+                total=progress.total,
+                progress=len(progress.done))
+            self.progress_label.update(
+                f"{len(progress.done)}/{progress.total} lines, " \
+                f"{progress.throughput:.1f} lines/s")
+
+
+class ScriptActionsCodec(object):
+    """Encodes the script screen's undo/redo actions, so that old history
+    can be spilled to disk.
+
+    Actions are encoded right after they're done, and only decoded to be
+    undone, so the script is in the same state both times. Lines in the
+    script are encoded by position, and lines that aren't, like removed
+    lines, by their contents.
+    """
+
+    def __init__(self, screen):
+        self.screen = screen
+
+    def encode(self, actions):
+        script = self.screen.script
+        lines = []
+        refs = {}
+
+        def encode_value(value):
+            if isinstance(value, ScriptLineModel):
+                if value not in refs:
+                    refs[value] = len(lines)
+                    lines.append(
+                        {"at": script.index(value)}
+                            if script.contains(value)
+                            else {"line": value.serialize()})
+                return {"ref": refs[value]}
+            return {"value": value}
+
+        def encode_context(context):
+            return {
+                name: encode_value(value)
+                    for name, value
+                    in context.items()
+            }
+
+        names = []
+        for action in (actions.undo, actions.redo):
+            name = getattr(action, "__name__", None)
+            if getattr(self.screen, name or "", None) != action:
+                return None
+            names.append(name)
+        undo_context = encode_context(actions.undo_context)
+        redo_context = encode_context(actions.redo_context)
+        return {
+            "undo": names[0],
+            "redo": names[1],
+            "lines": lines,
+            "undo_context": undo_context,
+            "redo_context": redo_context,
+        }
+
+    def decode(self, record):
+        script = self.screen.script
+        lines = [
+            script.line_at(line["at"])
+                if "at" in line
+                else ScriptLineModel.deserialize(script, line["line"])
+                for line
+                in record["lines"]
+        ]
+
+        def decode_context(context):
+            return {
+                name: (
+                    lines[value["ref"]]
+                        if "ref" in value
+                        else value["value"])
+                    for name, value
+                    in context.items()
+            }
+
+        return (
+            Actions(
+                getattr(self.screen, record["undo"]),
+                getattr(self.screen, record["redo"]),
+                undo_context=decode_context(record["undo_context"]),
+                redo_context=decode_context(record["redo_context"])))
+
 
 class ScriptScreen(TitledScreen):
     """The script editing screen."""
@@ -229,15 +404,34 @@ class ScriptScreen(TitledScreen):
     filename = var(None)
     play_lines = var(None)
 
-    def __init__(self, filename=None, script=None, *args, **kwargs):
-        self.actions = ActionsManager()
+    def __init__(
+            self,
+            filename=None,
+            script=None,
+            recovered=False,
+            loader=None,
+            journal=None,
+            *args,
+            **kwargs):
+        self.actions = ActionsManager.configure(ScriptActionsCodec(self))
         super().__init__(*args, **kwargs)
         self.initial_filename = filename
         self.script = script
+        self.loader = loader
+        self.journal = journal
+        self.loaded = asyncio.Event()
+        if loader is None:
+            self.loaded.set()
+        if recovered:
+            self.actions.mark_dirty()
         self.actions_toolbar = None
         self.lines = None
         self.file_toolbar = None
         self.play_worker = None
+        self.play_ahead = collections.deque()
+        self.deferred = 0
+        self.pending_edit = None
+        self.save_lock = asyncio.Lock()
 
     def compose(self):
         yield Header()
@@ -247,10 +441,8 @@ class ScriptScreen(TitledScreen):
                     classes="top horizontal toolbar"))
             yield self.actions_toolbar
 
-            self.lines = VerticalScroll(classes="scrollable")
-            with self.lines:
-                for line in self.script:
-                    yield ScriptLine(line)
+            self.lines = ScriptLineList(self.script, classes="scrollable")
+            yield self.lines
             self.file_toolbar = (
                 ScriptScreenFileToolbar(
                     classes="bottom horizontal toolbar"))
@@ -259,28 +451,74 @@ class ScriptScreen(TitledScreen):
 
     @contextlib.asynccontextmanager
     async def disable_actions_toolbar(self):
+        await self.loaded.wait()
         self.actions_toolbar.undo_disabled = True
         self.actions_toolbar.redo_disabled = True
         try:
             yield
         finally:
-            self.actions_toolbar.undo_disabled = self.actions.undo_empty
-            self.actions_toolbar.redo_disabled = self.actions.redo_empty
-            self.file_toolbar.save_disabled = self.actions.is_clean
-            self.update_title()
+            if not self.deferred:
+                self.actions_toolbar.undo_disabled = self.actions.undo_empty
+                self.actions_toolbar.redo_disabled = self.actions.redo_empty
+                self.file_toolbar.save_disabled = self.actions.is_clean
+                self.update_title()
+                self.update_line_number()
 
-    def play(self, lines):
-        if self.play_worker is None:
-            try:
-                line = None
-                while line is None:
-                    line = next(lines)
-                    if (line.context is None or
-                        not line.text.strip()):
+    @contextlib.asynccontextmanager
+    async def defer_updates(self):
+        """Defers updating the line list, selection and toolbars until the
+        outermost deferral ends, so that many edits refresh the screen
+        once."""
 
-                        line = None
+        self.deferred += 1
+        try:
+            with self.app.batch_update():
+                yield
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                editing, self.pending_edit = self.pending_edit, None
+                if editing is not None and editing is self.selection:
+                    await self.edit(editing)
+                else:
+                    await self.lines.update()
+                    self.lines.select(self.selection)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Groups the edits made inside it into one undo/redo unit, with
+        the screen updated once when it ends. If it raises, the edits are
+        undone."""
+
+        async with self.disable_actions_toolbar():
+            async with self.defer_updates():
+                async with self.actions.transaction():
+                    yield
+
+    async def update_lines(self):
+        if not self.deferred:
+            await self.lines.update()
 
-                self.selection = line.context
+    def is_playable(self, line):
+        return self.script.contains(line) and line.text.strip()
+
+    def next_playable(self, lines):
+        """Returns the next line to play, from the lines rendered ahead or
+        else from `lines`, or `None` when there are none left."""
+
+        while self.play_ahead:
+            line = self.play_ahead.popleft()
+            if self.is_playable(line):
+                return line
+        return next(filter(self.is_playable, lines), None)
+
+    def play(self, lines):
+        if lines is not self.play_lines:
+            self.play_ahead.clear()
+        if self.play_worker is None:
+            line = self.next_playable(lines)
+            if line is not None:
+                self.selection = line
                 self.play_worker = (
                     self.run_worker(
                         self.app.play(
@@ -288,23 +526,101 @@ class ScriptScreen(TitledScreen):
                             line.voice.id,
                             line.voice.rate)))
                 self.play_lines = lines
-            except StopIteration:
+                self.prerender(lines)
+            else:
                 self.play_lines = None
         else:
             self.play_lines = lines
 
+    def prerender(self, lines):
+        """Renders up to `PLAY_AHEAD` lines that will be played next in the
+        background, so that they play back-to-back from the cache."""
+
+        ahead = []
+        while len(self.play_ahead) < PLAY_AHEAD:
+            line = next(filter(self.is_playable, lines), None)
+            if line is None:
+                break
+            self.play_ahead.append(line)
+            ahead.append(line.serialize())
+        if ahead:
+            self.run_worker(self.app.prerender(ahead))
+
     def stop(self):
         self.play_lines = None
+        self.play_ahead.clear()
+        if self.play_worker is not None:
+            self.run_worker(self.app.stop())
+
+    def generate(self, path, **options):
+        async def generate():
+            await self.loaded.wait()
+            self.file_toolbar.generating = True
+            try:
+                await (
+                    self.app.generate(
+                        path,
+                        self.script,
+                        progress=progress,
+                        **options))
+            finally:
+                self.file_toolbar.generating = False
+
+        def progress(progress, event):
+            self.file_toolbar.update_progress(progress)
 
-    def generate(self, path):
-        self.run_worker(
-            self.app.generate(
-                path,
-                self.script))
+        self.run_worker(generate())
+
+    async def load(self):
+        """Adds the rest of the script's lines from the loader, a chunk at a
+        time read in a thread, updating the line list as they come.
+
+        Edits, saves and generating wait until all lines are loaded, so the
+        chunks always go at the end of the script, and the journal is only
+        attached once the script matches its file.
+        """
+
+        try:
+            while True:
+                first, last = await (
+                    asyncio.get_running_loop().run_in_executor(
+                        None,
+                        self.loader.read))
+                if first is None:
+                    break
+                self.loader.add(first, last)
+                await self.update_lines()
+        finally:
+            self.loader.close()
+        self.loader = None
+        self.attach_journal()
+        self.loaded.set()
+        self.update_title()
+        self.update_line_number()
 
     @on(Mount)
     def screen_mounted(self):
         self.filename = self.initial_filename
+        if self.loader is not None:
+            self.run_worker(self.load())
+        elif self.filename is not None:
+            self.attach_journal()
+
+    def attach_journal(self):
+        """Records edits to the script in its journal, reusing the journal
+        it was opened with, if any."""
+
+        self.script.journal = (
+            self.journal
+                if self.journal is not None
+                else ScriptJournal(self.filename))
+        self.journal = None
+
+    @on(Unmount)
+    def screen_unmounted(self):
+        self.actions.close()
+        if self.script.journal is not None:
+            self.script.journal.close()
 
     @on(Worker.StateChanged)
     def worker_state_changed(self, event):
@@ -321,26 +637,29 @@ class ScriptScreen(TitledScreen):
     @on(ScriptScreenActionsToolbar.Undo)
     async def actions_toolbar_undo(self):
         async with self.disable_actions_toolbar():
-            await self.actions.undo()
+            async with self.defer_updates():
+                await self.actions.undo()
 
     @on(ScriptScreenActionsToolbar.Redo)
     async def actions_toolbar_redo(self):
         async with self.disable_actions_toolbar():
-            await self.actions.redo()
+            async with self.defer_updates():
+                await self.actions.redo()
 
     @on(ScriptScreenActionsToolbar.First)
     def toolbar_first(self):
-        self.selection = (
-            self.script.head.context
-                if self.script.head is not None
-                else None)
+        self.selection = self.script.head
 
     @on(ScriptScreenActionsToolbar.Last)
     def toolbar_last(self):
-        self.selection = (
-            self.script.tail.context
-                if self.script.tail is not None
-                else None)
+        self.selection = self.script.tail
+
+    @on(ScriptScreenActionsToolbar.GoTo)
+    def toolbar_go_to(self, event):
+        if not self.script.is_empty():
+            self.selection = (
+                self.script.line_at(
+                    min(max(event.number, 1), len(self.script)) - 1))
 
     @on(ScriptScreenActionsToolbar.Stop)
     def toolbar_stop(self):
@@ -349,7 +668,7 @@ class ScriptScreen(TitledScreen):
     @on(ScriptScreenActionsToolbar.Play)
     def toolbar_play(self):
         line = (
-            self.selection.line
+            self.selection
                 if self.selection is not None
                 else self.script.head)
         if line is not None:
@@ -363,14 +682,43 @@ class ScriptScreen(TitledScreen):
     def toolbar_save_as(self):
         self.save_as()
 
+    @on(ScriptScreenFileToolbar.Import)
+    def toolbar_import(self):
+        def handle_import_screen(result):
+            if result is not None:
+                self.run_worker(
+                    self.import_file(
+                        result.path,
+                        **result.options))
+
+        voice = (
+            self.selection
+                if self.script.contains(self.selection)
+                else self.script.tail).voice
+        self.app.push_screen(
+            ImportScriptFileScreen(
+                self.script.meta.voice_options,
+                voice.id,
+                voice.rate),
+            handle_import_screen)
+
     @on(ScriptScreenFileToolbar.Generate)
     def toolbar_generate(self):
         def handle_generate_screen(result):
             if result is not None:
-                self.generate(result.path)
+                options = result.options
+                self.app.jobs = options.get("jobs", self.app.jobs)
+                self.app.output = options.get("output", self.app.output)
+                self.generate(
+                    result.path.with_suffix("")
+                        if options.get("mode") == "directory"
+                        else result.path,
+                    jobs=options.get("jobs"),
+                    mode=options.get("mode", "zip"),
+                    compression=options.get("compression", "stored"))
 
         self.app.push_screen(
-            SaveGeneratedFileScreen(),
+            SaveGeneratedFileScreen(self.app.jobs, self.app.output),
             handle_generate_screen)
 
     @on(ScriptScreenFileToolbar.Close)
@@ -379,11 +727,11 @@ class ScriptScreen(TitledScreen):
 
     @on(ScriptSelectLine)
     def line_selected(self, event):
-        self.selection = event.line.context
+        self.selection = event.line
 
     @on(ScriptPlayLine)
     def line_played(self, event):
-        self.selection = event.line.context
+        self.selection = event.line
         self.play(
             iter(
                 (event.line,)))
@@ -395,12 +743,8 @@ class ScriptScreen(TitledScreen):
             if not self.script.is_head(line):
                 before, _ = self.script.remove(line)
                 self.script.add(line, before=before)
-
-                node = line.context
-                self.lines.move_child(
-                    node,
-                    before=before.context)
-                self.selection = node
+                await self.update_lines()
+                self.selection = line
 
                 self.actions.add(
                     Actions(
@@ -413,26 +757,14 @@ class ScriptScreen(TitledScreen):
     async def undo_line_up_moved(self, before, line, **_):
         self.script.remove(before)
         self.script.add(before, before=line)
-        if before.context is not None and line.context is not None:
-            self.lines.move_child(
-                before.context,
-                before=line.context)
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Undo line move up is missing a node")
+        await self.update_lines()
+        self.selection = line
 
     async def redo_line_up_moved(self, before, line, **_):
         self.script.remove(line)
         self.script.add(line, before=before)
-        if before.context is not None and line.context is not None:
-            self.lines.move_child(
-                line.context,
-                before=before.context)
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Redo line move up is missing a node")
+        await self.update_lines()
+        self.selection = line
 
     @on(ScriptMoveLineDown)
     async def line_down_moved(self, event):
@@ -441,12 +773,8 @@ class ScriptScreen(TitledScreen):
             if not self.script.is_tail(line):
                 _, after = self.script.remove(line)
                 self.script.add(line, after=after)
-
-                node = line.context
-                self.lines.move_child(
-                    node,
-                    after=after.context)
-                self.selection = node
+                await self.update_lines()
+                self.selection = line
 
                 self.actions.add(
                     Actions(
@@ -459,26 +787,14 @@ class ScriptScreen(TitledScreen):
     async def undo_line_down_moved(self, after, line, **_):
         self.script.remove(after)
         self.script.add(after, after=line)
-        if after.context is not None and line.context is not None:
-            self.lines.move_child(
-                after.context,
-                after=line.context)
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Undo line move down is missing a node")
+        await self.update_lines()
+        self.selection = line
 
     async def redo_line_down_moved(self, after, line, **_):
         self.script.remove(line)
         self.script.add(line, after=after)
-        if after.context is not None and line.context is not None:
-            self.lines.move_child(
-                line.context,
-                after=after.context)
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Redo line move down is missing a node")
+        await self.update_lines()
+        self.selection = line
 
     @on(ScriptEditLineText)
     async def line_text_edited(self, event):
@@ -487,10 +803,9 @@ class ScriptScreen(TitledScreen):
             prev = line.text
             next = event.text
             line.text = next
-
-            node = line.context
-            node.text = next
-            self.selection = node
+            if line.context is not None:
+                line.context.text = next
+            self.selection = line
 
             self.actions.add(
                 Actions(
@@ -513,36 +828,26 @@ class ScriptScreen(TitledScreen):
 
     async def undo_line_text_edited(self, line, prev, **_):
         line.text = prev
-        node = line.context
-        if node is not None:
-            node.text = prev
-            self.selection = node
-        else:
-            raise RuntimeError(
-                "Undo line edit text is missing a node")
+        if line.context is not None:
+            line.context.text = prev
+        self.selection = line
 
     async def redo_line_text_edited(self, line, next, **_):
         line.text = next
-        node = line.context
-        if node is not None:
-            node.text = next
-            self.selection = node
-        else:
-            raise RuntimeError(
-                "Redo line edit text is missing a node")
+        if line.context is not None:
+            line.context.text = next
+        self.selection = line
 
     @on(ScriptEditLineVoiceRate)
     async def line_voice_rate_edited(self, event):
         async with self.disable_actions_toolbar():
             line = event.line
-            voice = line.voice
-            prev = voice.rate
+            prev = line.voice.rate
             next = event.rate
-            voice.rate = next
-
-            node = voice.context
-            node.voice_rate = next
-            self.selection = node
+            line.edit_voice(rate=next)
+            if line.context is not None:
+                line.context.voice_rate = next
+            self.selection = line
 
             self.actions.add(
                 Actions(
@@ -551,38 +856,31 @@ class ScriptScreen(TitledScreen):
                     Actions.context(
                         line=line,
                         prev=prev,
-                        next=next)))
+                        next=next),
+                    key=("voice_rate", line)))
 
     async def undo_line_voice_rate_edited(self, line, prev, **_):
-        line.voice.rate = prev
-        if line.context is not None and line.voice.context is not None:
-            line.voice.context.voice_rate = prev
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Undo line edit voice rate is missing a node")
+        line.edit_voice(rate=prev)
+        if line.context is not None:
+            line.context.voice_rate = prev
+        self.selection = line
 
     async def redo_line_voice_rate_edited(self, line, next, **_):
-        line.voice.rate = next
-        if line.context is not None and line.voice.context is not None:
-            line.voice.context.voice_rate = next
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Redo line edit voice rate is missing a node")
+        line.edit_voice(rate=next)
+        if line.context is not None:
+            line.context.voice_rate = next
+        self.selection = line
 
     @on(ScriptEditLineVoiceId)
     async def line_voice_id_edited(self, event):
         async with self.disable_actions_toolbar():
             line = event.line
-            voice = line.voice
-            prev = voice.id
+            prev = line.voice.id
             next = event.id
-            voice.id = next
-
-            node = voice.context
-            node.voice_id = next
-            self.selection = node
+            line.edit_voice(id=next)
+            if line.context is not None:
+                line.context.voice_id = next
+            self.selection = line
 
             self.actions.add(
                 Actions(
@@ -591,25 +889,20 @@ class ScriptScreen(TitledScreen):
                     Actions.context(
                         line=line,
                         prev=prev,
-                        next=next)))
+                        next=next),
+                    key=("voice_id", line)))
 
     async def undo_line_voice_id_edited(self, line, prev, **_):
-        line.voice.id = prev
-        if line.context is not None and line.voice.context is not None:
-            line.voice.context.voice_id = prev
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Undo line edit voice id is missing a node")
+        line.edit_voice(id=prev)
+        if line.context is not None:
+            line.context.voice_id = prev
+        self.selection = line
 
     async def redo_line_voice_id_edited(self, line, next, **_):
-        line.voice.id = next
-        if line.context is not None and line.voice.context is not None:
-            line.voice.context.voice_id = next
-            self.selection = line.context
-        else:
-            raise RuntimeError(
-                "Redo line edit voice id is missing a node")
+        line.edit_voice(id=next)
+        if line.context is not None:
+            line.context.voice_id = next
+        self.selection = line
 
     @on(ScriptAddLineAbove)
     async def line_above_added(self, event):
@@ -619,11 +912,7 @@ class ScriptScreen(TitledScreen):
                 self.script.add(
                     before.clone(text=""),
                     before=before))
-
-            node = ScriptLine(line)
-            await self.lines.mount(node, before=before.context)
-            node.editing = True
-            self.selection = node
+            await self.edit(line)
 
             self.actions.add(
                 Actions(
@@ -635,23 +924,12 @@ class ScriptScreen(TitledScreen):
 
     async def undo_line_above_added(self, before, line, **_):
         self.script.remove(line)
-        if before.context is not None and line.context is not None:
-            self.selection = before.context
-            await line.context.remove()
-        else:
-            raise RuntimeError(
-                "Undo line addition above is missing a node")
+        await self.update_lines()
+        self.selection = before
 
     async def redo_line_above_added(self, before, line, **_):
         self.script.add(line, before=before)
-        if before.context is not None:
-            node = ScriptLine(line)
-            await self.lines.mount(node, before=before.context)
-            node.editing = True
-            self.selection = node
-        else:
-            raise RuntimeError(
-                "Redo line addition above is missing a node")
+        await self.edit(line)
 
     @on(ScriptAddLineBelow)
     async def line_below_added(self, event):
@@ -661,11 +939,7 @@ class ScriptScreen(TitledScreen):
                 self.script.add(
                     after.clone(text=""),
                     after=after))
-
-            node = ScriptLine(line)
-            await self.lines.mount(node, after=after.context)
-            node.editing = True
-            self.selection = node
+            await self.edit(line)
 
             self.actions.add(
                 Actions(
@@ -677,34 +951,21 @@ class ScriptScreen(TitledScreen):
 
     async def undo_line_below_added(self, after, line, **_):
         self.script.remove(line)
-        if after.context is not None and line.context is not None:
-            self.selection = after.context
-            await line.context.remove()
-        else:
-            raise RuntimeError(
-                "Undo line addition below is missing a node")
+        await self.update_lines()
+        self.selection = after
 
     async def redo_line_below_added(self, after, line, **_):
         self.script.add(line, after=after)
-        if after.context is not None:
-            node = ScriptLine(line)
-            await self.lines.mount(node, after=after.context)
-            node.editing = True
-            self.selection = node
-        else:
-            raise RuntimeError(
-                "Redo line addition below is missing a node")
+        await self.edit(line)
 
     @on(ScriptRemoveLine)
     async def line_removed(self, event):
         async with self.disable_actions_toolbar():
             line = event.line
             _, after = self.script.remove(line)
-
-            node = line.context
-            if self.selection is node:
+            if self.selection is line:
                 self.selection = None
-            await node.remove()
+            await self.update_lines()
 
             self.actions.add(
                 Actions(
@@ -716,38 +977,119 @@ class ScriptScreen(TitledScreen):
 
     async def undo_line_removed(self, line, after, **_):
         self.script.add(line, before=after)
-        if not after or after.context is not None:
-            node = ScriptLine(line)
-            await self.lines.mount(node, before=after and after.context)
-            self.selection = node
+        await self.update_lines()
+        self.selection = line
 
     async def redo_line_removed(self, line, **_):
         self.script.remove(line)
-        node = line.context
-        if node is not None:
-            if self.selection is node:
-                self.selection = None
-            await node.remove()
-        else:
-            raise RuntimeError(
-                "Redo line removal is missing a node")
+        if self.selection is line:
+            self.selection = None
+        await self.update_lines()
+
+    async def import_file(self, path, split, voice_id, voice_rate):
+        """Imports lines from the file at `path` after the selected line, or
+        at the end of the script, as one undoable action.
+
+        The lines are read and built in a thread, then added to the script
+        at once, so the line list is only updated once however many there
+        are.
+        """
+
+        voice = ScriptVoiceModel.intern(self.script, voice_id, voice_rate)
+        try:
+            first, last = await (
+                asyncio.get_running_loop().run_in_executor(
+                    None,
+                    self.script.build,
+                    import_texts(path, split),
+                    voice))
+        except (OSError, ValueError):
+            self.app.bell()
+            return
+        if first is None:
+            return
+        async with self.transaction():
+            after = (
+                self.selection
+                    if self.script.contains(self.selection)
+                    else self.script.tail)
+            self.script.splice(first, last, after=after)
+            self.selection = first
+
+            self.actions.add(
+                Actions(
+                    self.undo_lines_imported,
+                    self.redo_lines_imported,
+                    Actions.context(
+                        after=after,
+                        first=first,
+                        last=last)))
+
+    async def undo_lines_imported(self, after, first, last, **_):
+        self.script.cut(first, last)
+        await self.update_lines()
+        self.selection = after
+
+    async def redo_lines_imported(self, after, first, last, **_):
+        self.script.splice(first, last, after=after)
+        await self.update_lines()
+        self.selection = first
+
+    async def edit(self, line):
+        """Selects `line`, scrolls it into view and starts editing it."""
+
+        if self.deferred:
+            self.selection = line
+            self.pending_edit = line
+            return
+        await self.lines.update()
+        self.selection = line
+        await self.lines.show(line)
+        if line.context is not None:
+            line.context.editing = True
 
     def save(self, quit=False):
         if self.filename is not None:
-            with open(self.filename, "w") as script:
-                script.write(
-                    json.dumps(
-                        self.script.serialize(),
-                        indent=4))
-            if quit:
-                self.app.pop_screen()
-            else:
-                self.actions.mark_clean()
-                self.file_toolbar.save_disabled = self.actions.is_clean
-                self.update_title()
+            self.run_worker(self.write(self.filename, quit=quit))
         else:
             self.save_as(quit=quit)
 
+    async def write(self, filename, quit=False):
+        """Saves a snapshot of the script to `filename` in a thread, then
+        marks the state it was taken in as clean. Saves are written one at
+        a time, in order."""
+
+        async with self.save_lock:
+            await self.loaded.wait()
+            state = self.actions.state
+            snapshot = storage.snapshot(self.script)
+            journal = self.script.journal
+            offset = (
+                journal.offset
+                    if journal is not None
+                    else 0)
+            try:
+                await (
+                    asyncio.get_running_loop().run_in_executor(
+                        None,
+                        storage.save_script,
+                        filename,
+                        snapshot,
+                        storage.script_format()))
+            except OSError:
+                self.app.bell()
+                return
+            if journal is not None:
+                journal.compact(offset, filename)
+            else:
+                self.script.journal = ScriptJournal(filename)
+        if quit:
+            self.app.pop_screen()
+        else:
+            self.actions.mark_clean(state)
+            self.file_toolbar.save_disabled = self.actions.is_clean
+            self.update_title()
+
     def save_as(self, quit=False):
         def handle_save_screen(result):
             if result is not None:
@@ -761,17 +1103,24 @@ class ScriptScreen(TitledScreen):
     def close(self):
         def handle_closing_screen(result):
             if result is False:
+                self.discard_journal()
                 self.app.pop_screen()
             elif result is True:
                 self.save(quit=True)
 
         if self.actions.is_clean:
+            self.discard_journal()
             self.app.pop_screen()
         else:
             self.app.push_screen(
                 SaveBeforeClosingScreen(self.filename),
                 handle_closing_screen)
 
+    def discard_journal(self):
+        if self.script.journal is not None:
+            self.script.journal.discard()
+            self.script.journal = None
+
     def action_close(self):
         self.close()
 
@@ -784,15 +1133,22 @@ class ScriptScreen(TitledScreen):
             ""
                 if self.actions.is_clean
                 else " *")
-        self.title = f"{filename}{unsaved}"
+        loading = (
+            ""
+                if self.loaded.is_set()
+                else " (loading\N{HORIZONTAL ELLIPSIS})")
+        self.title = f"{filename}{unsaved}{loading}"
+
+    def update_line_number(self):
+        self.actions_toolbar.line_number = (
+            self.script.index(self.selection) + 1
+                if self.script.contains(self.selection)
+                else None)
 
     def watch_selection(self, prev, next):
-        if next is not prev:
-            if prev is not None:
-                prev.editing = False
-                prev.selected = False
-            if next is not None:
-                next.selected = True
+        if next is not prev and not self.deferred:
+            self.lines.select(next)
+            self.update_line_number()
 
     def watch_filename(self):
         self.update_title()
@@ -1,9 +1,14 @@
+import asyncio
+from rich.text import Text
 from textual import on, work
 from textual.containers import Container, Vertical
 from textual.events import (
-    Blur, Click, DescendantFocus, Key, Mount, Unmount,)
+    Blur, Click, DescendantFocus, Key, Mount, Resize, Unmount,)
+from textual.geometry import Size
 from textual.message import Message
 from textual.reactive import var
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
 from textual.widgets import Button, Input , Select, Static
 from .messages import (
     ScriptSelectLine, ScriptPlayLine, ScriptEditLineText,
@@ -168,11 +173,7 @@ class ScriptLineVoiceToolbar(Static):
                 with Container(classes="singular group"):
                     self.voice_id_select = (
                         Select(
-                            [
-                                (voice.name, voice.id)
-                                    for voice
-                                    in self.voice.script.meta.voices
-                            ],
+                            self.voice.script.meta.voice_options,
                             id="id",
                             prompt="Voice",
                             allow_blank=False,
@@ -180,13 +181,17 @@ class ScriptLineVoiceToolbar(Static):
                             classes="singular control"))
                     yield self.voice_id_select
 
-    @on(Mount)
-    def voice_mounted(self):
-        self.voice.context = self
+    def bind(self, voice):
+        """Shows another voice in this toolbar, when its script line editor
+        is recycled."""
 
-    @on(Unmount)
-    def voice_unmounted(self):
-        self.voice.context = None
+        self.voice = voice
+        self.voice_rate_input.value = f"{voice.rate}"
+        # HACK: See `watch_voice_id`.
+        if hasattr(self.voice_id_select, "_options"):
+            self.voice_id_select.value = voice.id
+        self.voice_rate = voice.rate
+        self.voice_id = voice.id
 
     # HACK: As of textual@0.24.1, this should use the "#id" selector
     # for potential disambiguation, but the `control` attribute does
@@ -381,17 +386,88 @@ class ScriptLineTextInput(Input):
         self.post_message(self.Edit(submit=True))
 
 
+class ScriptLineSummary(Static):
+    """The compact, read-only view of a script line that isn't selected.
+    The line list replaces it with a `ScriptLine` editor when the line is
+    selected."""
+
+    number = var(None)
+    text = var(None)
+    voice_id = var(None)
+    voice_rate = var(None)
+
+    def __init__(self, line, *args, **kwargs):
+        super().__init__(self.summarize(line), *args, **kwargs)
+        self.line = line
+        line.context = self
+
+    @staticmethod
+    def summarize(line, number=None):
+        voice = line.voice
+        return (
+            Text.assemble(
+                (
+                    f"{number:>5}  "
+                        if number is not None
+                        else "",
+                    "dim"),
+                (line.script.meta.voice_names.get(voice.id, voice.id), "bold"),
+                f"  {voice.rate}  ",
+                line.text,
+                no_wrap=True,
+                overflow="ellipsis"))
+
+    @on(Unmount)
+    def summary_unmounted(self):
+        if self.line.context is self:
+            self.line.context = None
+
+    @on(Click)
+    def summary_clicked(self):
+        self.post_message(
+            ScriptSelectLine(
+                self.line))
+
+    def bind(self, line):
+        """Shows another script line in this view, so that it can be
+        recycled as the script is scrolled."""
+
+        if self.line.context is self:
+            self.line.context = None
+        self.line = line
+        line.context = self
+        self.text = line.text
+        self.voice_id = line.voice.id
+        self.voice_rate = line.voice.rate
+        self.update(self.summarize(line, self.number))
+
+    def watch_number(self):
+        self.update(self.summarize(self.line, self.number))
+
+    def watch_text(self):
+        self.update(self.summarize(self.line, self.number))
+
+    def watch_voice_id(self):
+        self.update(self.summarize(self.line, self.number))
+
+    def watch_voice_rate(self):
+        self.update(self.summarize(self.line, self.number))
+
+
 class ScriptLine(Static):
     """The editor for a script line."""
 
     editing = var(False)
     selected = var(False)
     text = var(None)
+    voice_id = var(None)
+    voice_rate = var(None)
 
     def __init__(self, line, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.line = line
         self.editing_toolbar = None
+        self.voice_toolbar = None
         self.text_container = None
         self.text_static = None
         self.text_input = None
@@ -403,10 +479,11 @@ class ScriptLine(Static):
                 classes="left vertical toolbar"))
         yield self.editing_toolbar
 
-        yield (
+        self.voice_toolbar = (
             ScriptLineVoiceToolbar(
                 self.line.voice,
                 classes="horizontal toolbar width--auto margin-left--1"))
+        yield self.voice_toolbar
 
         self.text_container = (
             ScriptLineTextContainer(
@@ -426,7 +503,28 @@ class ScriptLine(Static):
 
     @on(Unmount)
     def line_unmounted(self):
-        self.line.context = None
+        if self.line.context is self:
+            self.line.context = None
+
+    def bind(self, line):
+        """Shows another script line in this editor, so that it can be
+        recycled as the script is scrolled. Pending text edits of the
+        current line are posted first."""
+
+        if line is not self.line:
+            if self.editing:
+                self.text_edited()
+                self.editing = False
+            if self.line.context is self:
+                self.line.context = None
+            self.line = line
+            line.context = self
+            self.text_static.update(line.text)
+            self.text_input.value = line.text
+            self.text = line.text
+            self.voice_toolbar.bind(line.voice)
+            self.voice_id = line.voice.id
+            self.voice_rate = line.voice.rate
 
     @on(Click)
     def line_clicked(self):
@@ -534,7 +632,7 @@ class ScriptLine(Static):
         if self.editing:
             self.text_container.add_class("editing")
             self.text_input.disabled = False
-            self.text_input.focus()
+            self.text_input.focus(scroll_visible=False)
             self.post_message(
                 ScriptSelectLine(
                     self.line))
@@ -546,7 +644,6 @@ class ScriptLine(Static):
     def watch_selected(self):
         if self.selected:
             self.add_class("selected")
-            self.scroll_visible()
         else:
             self.remove_class("selected")
 
@@ -554,3 +651,229 @@ class ScriptLine(Static):
         if self.text is not None:
             self.text_input.value = self.text
             self.text_static.update(self.text)
+
+    def watch_voice_id(self):
+        if self.voice_id is not None:
+            self.voice_toolbar.voice = self.line.voice
+            self.voice_toolbar.voice_id = self.voice_id
+
+    def watch_voice_rate(self):
+        if self.voice_rate is not None:
+            self.voice_toolbar.voice = self.line.voice
+            self.voice_toolbar.voice_rate = self.voice_rate
+
+
+class ScriptLineList(ScrollView):
+    """The scrolling list of script lines.
+
+    Lines are only mounted for the lines in or near the viewport, and are
+    recycled for other lines as the list is scrolled. The selected line
+    is shown with a `ScriptLine` editor and the others with a compact
+    `ScriptLineSummary`.
+
+    The list sets its own virtual size, assuming every line is as tall as
+    the summaries measured so far, and renders only its visible rows. The
+    mounted lines are docked in a window that's moved to where they are in
+    the script, relative to the scroll position, so nothing as tall as
+    the script is rendered or laid out.
+    """
+
+    OVERSCAN = 2
+    ROW_HEIGHT = 10
+
+    def __init__(self, script, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.script = script
+        self.selection = None
+        self.start = 0
+        self.row_height = self.ROW_HEIGHT
+        self.lock = asyncio.Lock()
+        self.window = Vertical(classes="window")
+
+    def compose(self):
+        yield self.window
+
+    def render_line(self, y):
+        return Strip.blank(self.size.width, self.rich_style)
+
+    @property
+    def nodes(self):
+        return [
+            child
+                for child
+                in self.window.children
+                if isinstance(child, (ScriptLine, ScriptLineSummary))
+        ]
+
+    def node_class(self, line):
+        return (
+            ScriptLine
+                if line is self.selection
+                else ScriptLineSummary)
+
+    @property
+    def window_size(self):
+        """The number of editors needed to fill the viewport."""
+
+        height = self.size.height or self.app.size.height
+        return height // self.row_height + 1 + 2 * self.OVERSCAN
+
+    @on(Mount)
+    async def list_mounted(self):
+        await self.update()
+
+    @on(Resize)
+    def list_resized(self):
+        self.call_later(self.update)
+
+    def watch_scroll_y(self, old_value, new_value):
+        super().watch_scroll_y(old_value, new_value)
+        first = int(new_value // self.row_height)
+        last = int((new_value + self.size.height) // self.row_height)
+        if (first < self.start or
+            last >= self.start + self.window_size):
+
+            self.start = first - self.OVERSCAN
+            self.call_later(self.update)
+        self.place()
+
+    def place(self, height=None):
+        """Sizes the list for the script, given the `height` of the
+        window if it's been measured, and moves the window to the
+        position of its first line."""
+
+        count = len(self.script)
+        mounted = len(self.nodes)
+        if height is None:
+            height = mounted * self.row_height
+        self.virtual_size = (
+            Size(0, (count - mounted) * self.row_height + height))
+        self.window.styles.offset = (
+            (0, self.start * self.row_height - round(self.scroll_y)))
+
+    def scroll_to_region(self, region, *args, **kwargs):
+        """Scrolls to a region of the window, such as a focused line, by
+        its position in the list."""
+
+        return (
+            super().scroll_to_region(
+                region.translate((0, self.start * self.row_height)),
+                *args,
+                **kwargs))
+
+    async def mount_lines(self, nodes, anchor):
+        """Mounts `nodes` in the window after `anchor`, or first if it's
+        `None`."""
+
+        if anchor is None:
+            await self.window.mount(*nodes, before=0)
+        else:
+            await self.window.mount(*nodes, after=anchor)
+
+    async def update(self):
+        """Mounts, recycles and reorders line views to match the lines of
+        the window starting at `self.start`, after scrolling, selecting,
+        or after lines were added, moved or removed."""
+
+        async with self.lock:
+            count = len(self.script)
+            size = self.window_size
+            self.start = max(0, min(self.start, count - size))
+            lines = list(self.script.lines(self.start, self.start + size))
+            wanted = set(lines)
+            nodes = {}
+            free = {
+                ScriptLine: [],
+                ScriptLineSummary: [],
+            }
+            for node in self.nodes:
+                if (node.line in wanted and
+                    isinstance(node, self.node_class(node.line))):
+
+                    nodes[node.line] = node
+                else:
+                    free[type(node)].append(node)
+            anchor = None
+            mounting = []
+            for line in lines:
+                node = nodes.get(line)
+                if node is None and free[self.node_class(line)]:
+                    node = free[self.node_class(line)].pop()
+                    node.bind(line)
+                if node is None:
+                    mounting.append(self.node_class(line)(line))
+                    continue
+                if mounting:
+                    await self.mount_lines(mounting, anchor)
+                    anchor = mounting[-1]
+                    mounting = []
+                children = self.window.children
+                if anchor is None:
+                    if children.index(node) != 0:
+                        self.window.move_child(node, before=0)
+                elif children.index(node) != children.index(anchor) + 1:
+                    self.window.move_child(node, after=anchor)
+                anchor = node
+            if mounting:
+                await self.mount_lines(mounting, anchor)
+            for node in free[ScriptLine] + free[ScriptLineSummary]:
+                await node.remove()
+            for n, line in enumerate(lines, self.start + 1):
+                if isinstance(line.context, ScriptLineSummary):
+                    line.context.number = n
+            if self.selection is not None:
+                node = self.selection.context
+                if isinstance(node, ScriptLine):
+                    node.selected = True
+            self.place()
+        self.call_after_refresh(self.measure)
+
+    def measure(self):
+        """Measures the height of mounted editors, to size the list."""
+
+        regions = [node.virtual_region for node in self.nodes]
+        heights = [
+            next.y - prev.y
+                for prev, next
+                in zip(regions, regions[1:])
+                if next.y > prev.y
+        ]
+        if heights and min(heights) != self.row_height:
+            self.row_height = min(heights)
+            self.call_later(self.update)
+        else:
+            self.place(self.window.outer_size.height)
+
+    def select(self, line):
+        """Expands `line` as the selected line and scrolls it into view."""
+
+        self.selection = line
+        if line is not None:
+            self.call_later(self.show, line)
+        else:
+            self.call_later(self.update)
+
+    async def show(self, line):
+        """Mounts a view for `line` if needed and scrolls it into view."""
+
+        if self.script.contains(line):
+            if line.context is None:
+                self.start = self.script.index(line) - self.window_size // 2
+            await self.update()
+            if line.context is not None:
+                self.call_after_refresh(self.scroll_to_node, line.context)
+
+    def scroll_to_node(self, node):
+        """Scrolls a mounted editor into view, by its position in the
+        script rather than its region, which may not be laid out yet."""
+
+        nodes = self.nodes
+        if node in nodes:
+            top = (self.start + nodes.index(node)) * self.row_height
+            bottom = top + max(node.outer_size.height, self.row_height)
+            if top < self.scroll_y:
+                self.scroll_to(y=top, animate=False)
+            elif bottom > self.scroll_y + self.size.height:
+                self.scroll_to(
+                    y=bottom - self.size.height,
+                    animate=False)
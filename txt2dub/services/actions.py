@@ -1,67 +1,328 @@
+import contextlib
 import inspect
+import itertools
+import json
+import os
+import tempfile
+from .paths import user_cache_dir
+
+
+DEFAULT_LIMIT = 200
 
 
 class Actions(object):
-    """Undo/redo actions."""
-    def __init__(self, undo=None, redo=None, context=None):
+    """Undo/redo actions.
+
+    Undo and redo are called with the same `context` unless separate
+    `undo_context` or `redo_context` are given. Consecutive actions with
+    the same `key` are coalesced into one, e.g. repeated edits of the same
+    line's voice rate.
+    """
+    def __init__(
+            self,
+            undo=None,
+            redo=None,
+            context=None,
+            key=None,
+            undo_context=None,
+            redo_context=None):
         self.undo = undo
         self.redo = redo
-        self.context = context or {}
-        self.mark = None
+        self.undo_context = undo_context or context or {}
+        self.redo_context = redo_context or context or {}
+        self.key = key
+        self.serial = None
+        self.record = None
 
-    async def run(self, action):
+    async def run(self, action, context):
         if inspect.iscoroutinefunction(action):
-            await action(**self.context)
+            await action(**context)
         else:
-            action(**self.context)
+            action(**context)
 
     async def run_undo(self):
         if self.undo is not None:
-            await self.run(self.undo)
+            await self.run(self.undo, self.undo_context)
 
     async def run_redo(self):
         if self.redo is not None:
-            await self.run(self.redo)
+            await self.run(self.redo, self.redo_context)
+
+    def coalesce(self, actions):
+        """Returns actions that undo this and redo `actions`, which came
+        right after it."""
+
+        return (
+            self.__class__(
+                self.undo,
+                actions.redo,
+                key=self.key,
+                undo_context=self.undo_context,
+                redo_context=actions.redo_context))
 
     @staticmethod
     def context(**context):
         return context
 
 
+class CompoundActions(Actions):
+    """Actions done together in a transaction, which are undone in reverse
+    and redone in order as one unit.
+
+    Actions brought back from an `ActionsLog` may still be encoded, and are
+    decoded with `decode` right before they are undone, when the script is
+    in the state they were encoded in.
+    """
+
+    def __init__(self, actions=(), decode=None):
+        super().__init__()
+        self.actions = list(actions)
+        self.decode = decode
+
+    def __len__(self):
+        return len(self.actions)
+
+    def add(self, actions):
+        last = (
+            self.actions[-1]
+                if self.actions
+                else None)
+        if (actions.key is not None and
+                last is not None and
+                last.key == actions.key):
+            self.actions[-1] = last.coalesce(actions)
+            return self.actions[-1]
+        self.actions.append(actions)
+        return actions
+
+    async def run_undo(self):
+        for n in reversed(range(len(self.actions))):
+            actions = self.actions[n]
+            if not isinstance(actions, Actions):
+                actions = self.actions[n] = self.decode(actions)
+            await actions.run_undo()
+
+    async def run_redo(self):
+        for actions in self.actions:
+            await actions.run_redo()
+
+
+class ActionsLog(object):
+    """A stack of encoded actions in a temporary file, holding the oldest
+    undo history when it is spilled from memory.
+
+    Records are stored as lines of JSON, and only their offsets are kept
+    in memory. The file is deleted when the log is closed.
+    """
+
+    def __init__(self, dir=None):
+        self.dir = (
+            dir
+                if dir is not None
+                else user_cache_dir())
+        self.file = None
+        self.offsets = []
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def push(self, record):
+        if self.file is None:
+            os.makedirs(self.dir, exist_ok=True)
+            self.file = tempfile.TemporaryFile(prefix="undo-", dir=self.dir)
+        offset = (
+            self.offsets[-1][1]
+                if self.offsets
+                else 0)
+        data = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        self.file.seek(offset)
+        self.file.write(data + b"\n")
+        self.offsets.append((offset, offset + len(data) + 1))
+
+    def pop(self):
+        start, end = self.offsets.pop()
+        self.file.seek(start)
+        data = self.file.read(end - start)
+        self.file.truncate(start)
+        return json.loads(data)
+
+    def clear(self):
+        self.offsets = []
+        if self.file is not None:
+            self.file.truncate(0)
+
+    def close(self):
+        self.offsets = []
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
 class ActionsManager(object):
-    """Undo/redo actions manager."""
+    """Undo/redo actions manager.
+
+    At most `limit` actions are held in memory. With a `codec`, older
+    actions are spilled to an `ActionsLog` and brought back as they are
+    undone, otherwise they are forgotten. The codec's `encode(actions)`
+    returns a JSON-serializable record, or `None` if the actions can't be
+    spilled, and `decode(record)` returns the actions again.
+
+    Each state of the history has a serial number, which is what a clean
+    mark refers to, so that it survives actions being spilled, coalesced
+    or forgotten.
+
+    Actions added inside a `transaction` are grouped into one entry of
+    `CompoundActions`.
+    """
 
     @property
     def undo_empty(self):
-        return self.index == 0
+        return self.index == 0 and not self.log
 
     @property
     def redo_empty(self):
         return self.index == len(self.queue)
 
     @property
-    def is_clean(self):
+    def state(self):
+        """The serial number of the current state."""
+
         return (
-            self.index == 0
-                if self.mark is None
-                else (
-                    self.index > 0 and
-                    self.index <= len(self.queue) and
-                    self.mark is self.queue[self.index - 1].mark))
-
-    def __init__(self):
+            self.queue[self.index - 1].serial
+                if self.index > 0
+                else self.bottom)
+
+    @property
+    def is_clean(self):
+        return self.state == self.mark
+
+    def __init__(self, limit=None, codec=None, log=None):
+        self.limit = limit
+        self.codec = codec
+        self.log = (
+            (log if log is not None else ActionsLog())
+                if codec is not None
+                else ())
         self.queue = []
         self.index = 0
-        self.mark = None
+        self.serials = itertools.count(1)
+        self.bottom = 0
+        self.mark = 0
+        self.group = None
+
+    @classmethod
+    def configure(cls, codec=None):
+        """Returns a manager configured by the `TXT2DUB_UNDO_LIMIT`
+        environment variable, the number of actions held in memory, and
+        `TXT2DUB_UNDO_SPILL`, which can be set to `0` to forget older
+        actions instead of spilling them with `codec`."""
+
+        limit = os.environ.get("TXT2DUB_UNDO_LIMIT")
+        spill = os.environ.get("TXT2DUB_UNDO_SPILL", "1") != "0"
+        return (
+            cls(limit=(
+                    max(int(limit), 1)
+                        if limit
+                        else DEFAULT_LIMIT),
+                codec=(
+                    codec
+                        if spill
+                        else None)))
+
+    def encode(self, actions):
+        if self.codec is None:
+            return None
+        if isinstance(actions, CompoundActions):
+            records = [child.record for child in actions.actions]
+            return (
+                {"group": records}
+                    if None not in records
+                    else None)
+        return self.codec.encode(actions)
+
+    def decode(self, record):
+        if "group" in record:
+            return CompoundActions(record["group"], decode=self.decode)
+        return self.codec.decode(record)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Groups the actions added inside it into one entry of the
+        history. Transactions can be nested, and only the outermost one
+        adds the entry. If it raises, the grouped actions are undone and
+        discarded instead."""
+
+        if self.group is not None:
+            yield self
+            return
+        self.group = CompoundActions(decode=self.decode)
+        try:
+            yield self
+        except BaseException:
+            group, self.group = self.group, None
+            await group.run_undo()
+            raise
+        group, self.group = self.group, None
+        if group:
+            self.add(group)
 
     def add(self, actions):
-        if self.index != len(self.queue):
-            self.queue = self.queue[:self.index]
-        self.queue.append(actions)
-        self.index += 1
+        if self.group is not None:
+            actions = self.group.add(actions)
+            actions.record = self.encode(actions)
+            return self
+        del self.queue[self.index:]
+        top = (
+            self.queue[self.index - 1]
+                if self.index > 0
+                else None)
+        if (actions.key is not None and
+                top is not None and
+                top.key == actions.key and
+                top.serial != self.mark):
+            actions = top.coalesce(actions)
+            self.queue[self.index - 1] = actions
+        else:
+            self.queue.append(actions)
+            self.index += 1
+        actions.serial = next(self.serials)
+        actions.record = self.encode(actions)
+        if self.limit is not None:
+            while len(self.queue) > self.limit:
+                self.spill()
         return self
 
+    def spill(self):
+        """Moves the oldest actions in memory to the log, or forgets them
+        without a codec or if they can't be encoded."""
+
+        actions = self.queue.pop(0)
+        self.index -= 1
+        if self.codec is not None and actions.record is not None:
+            self.log.push(
+                {
+                    "serial": actions.serial,
+                    "bottom": self.bottom,
+                    "actions": actions.record,
+                })
+        elif self.log:
+            self.log.clear()
+        self.bottom = actions.serial
+
+    def unspill(self):
+        """Moves the newest actions in the log back into memory."""
+
+        record = self.log.pop()
+        actions = self.decode(record["actions"])
+        actions.serial = record["serial"]
+        actions.record = record["actions"]
+        self.queue.insert(0, actions)
+        self.index += 1
+        self.bottom = record["bottom"]
+
     async def undo(self):
+        if self.index == 0 and self.log:
+            self.unspill()
         if self.index > 0:
             self.index -= 1
             actions = self.queue[self.index]
@@ -73,10 +334,24 @@ class ActionsManager(object):
             self.index += 1
             await actions.run_redo()
 
-    def mark_clean(self):
-        self.mark = object()
-        if self.index > 0 and self.index <= len(self.queue):
-            self.queue[self.index - 1].mark = self.mark
+    def mark_clean(self, state=None):
+        """Marks the current state, or the state with serial number `state`,
+        as clean."""
+
+        self.mark = (
+            state
+                if state is not None
+                else self.state)
+
+    def mark_dirty(self):
+        """Marks no state as clean, e.g. for edits recovered from a journal.
+        """
+
+        self.mark = None
+
+    def close(self):
+        if self.codec is not None:
+            self.log.close()
 
 
 def context(**context):
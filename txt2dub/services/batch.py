@@ -0,0 +1,259 @@
+import asyncio
+import heapq
+import tempfile
+import time
+from ..tts.cache import normalize_text
+from .storage import generated_path, is_script, load_script
+
+
+SLOWEST = 10
+
+
+def batch_paths(path, output_dir=None):
+    """Returns the script paths of a batch, paired with the paths to
+    generate them at, from a directory searched for scripts or from a
+    manifest listing a script per line.
+
+    Manifest paths are relative to the manifest, and blank lines and lines
+    starting with `#` are skipped. Scripts are generated beside themselves,
+    or in `output_dir` at the same relative path.
+    """
+
+    if path.is_dir():
+        root = path
+        scripts = sorted(
+            script
+                for script
+                in path.rglob("*")
+                if (is_script(script) and
+                    not script.name.startswith(".") and
+                    script.is_file()))
+    else:
+        root = path.parent
+        with open(path, "r", encoding="utf-8") as f:
+            scripts = [
+                root / line.strip()
+                    for line
+                    in f
+                    if line.strip() and not line.strip().startswith("#")
+            ]
+
+    def output_path(script):
+        output = generated_path(script)
+        if output_dir is None:
+            return output
+        try:
+            return output_dir / output.relative_to(root)
+        except ValueError:
+            return output_dir / output.name
+
+    return [(script, output_path(script)) for script in scripts]
+
+
+class BatchScript(object):
+    """A script of a batch, waiting for its lines to be rendered."""
+
+    def __init__(self, path, output):
+        self.path = path
+        self.output = output
+        self.script = None
+        self.lines = 0
+        self.pending = set()
+        self.started = False
+
+
+class BatchRender(object):
+    """Generates a batch of scripts on one shared pool of interpreter
+    processes.
+
+    Every distinct line of the batch, by text, voice and rate, is rendered
+    once, so lines that scripts share, like intros and outros, are only
+    synthesized once. Lines are queued script by script, and each script
+    is generated as soon as its own lines are rendered, while the pool
+    goes on with the lines of later scripts.
+    """
+
+    def __init__(
+            self,
+            tts,
+            paths,
+            jobs=None,
+            mode="zip",
+            compression="stored",
+            report=None,
+            slowest=SLOWEST):
+        """Create a batch render.
+
+        `tts`
+            the `TTSInterface` whose interpreter pool renders the batch
+        `paths`
+            pairs of script paths and the paths to generate them at, as
+            returned by `batch_paths`
+        `report`
+            an optional function called with the name and fields of each
+            event, for scripts generated or failed, lines rendered and the
+            summary at the end
+        `slowest`
+            the number of slowest lines to report in the summary
+        """
+        self.tts = tts
+        self.scripts = [BatchScript(path, output) for path, output in paths]
+        self.jobs = jobs or tts.jobs
+        self.mode = mode
+        self.compression = compression
+        self.report = report or (lambda event, **fields: None)
+        self.slowest = slowest
+        self.index = {}
+        self.lines = []
+        self.sources = []
+        self.waiting = []
+        self.times = []
+        self.done = 0
+        self.synthesized = 0
+        self.failed = 0
+        self.rendered = None
+        self.generating = []
+
+    def queue(self, script):
+        """Queues the lines of `script` that aren't queued yet, and notes
+        which lines it waits for."""
+
+        indexes = {}
+        for n, line in enumerate(script.script):
+            text = normalize_text(line.text)
+            if text:
+                script.lines += 1
+                key = (text, line.voice.id, line.voice.rate)
+                index = indexes.get(key)
+                if index is None:
+                    index = self.index.get(key)
+                    if index is None:
+                        index = self.index[key] = len(self.lines)
+                        self.lines.append(dict(line.serialize(), index=index))
+                        self.sources.append((script, n))
+                        self.waiting.append([])
+                    indexes[key] = index
+                    script.pending.add(index)
+                    self.waiting[index].append(script)
+
+    def line_rendered(self, event):
+        index = event.get("index")
+        if (event.get("event") != "render" or
+                not isinstance(index, int) or
+                not 0 <= index < len(self.waiting)):
+
+            return
+        self.done += 1
+        if not event.get("cached"):
+            self.synthesized += 1
+            heapq.heappush(self.times, (event.get("elapsed") or 0.0, index))
+            if len(self.times) > self.slowest:
+                heapq.heappop(self.times)
+        self.report(
+            "progress",
+            done=self.done,
+            total=len(self.lines),
+            line=event)
+        waiting, self.waiting[index] = self.waiting[index], ()
+        for script in waiting:
+            script.pending.discard(index)
+            if not script.pending:
+                self.start(script)
+
+    def start(self, script):
+        if not script.started:
+            script.started = True
+            self.generating.append(
+                asyncio.ensure_future(
+                    self.generate(script)))
+
+    async def generate(self, script):
+        output = (
+            script.output.with_suffix("")
+                if self.mode == "directory"
+                else script.output)
+        try:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            summary = (
+                await (
+                    self.tts.generate(
+                        output,
+                        script.script,
+                        jobs=1,
+                        mode=self.mode,
+                        compression=self.compression,
+                        rendered=self.rendered)))
+        except (OSError, ValueError) as e:
+            self.fail(script, e)
+            return
+        self.report(
+            "script",
+            script=f"{script.path}",
+            output=f"{output}",
+            **summary)
+
+    def fail(self, script, error):
+        self.failed += 1
+        self.report(
+            "error",
+            script=f"{script.path}",
+            message=f"{error}")
+
+    async def run(self):
+        """Generates every script of the batch, and returns whether they
+        were all generated."""
+
+        started = time.monotonic()
+        meta = await self.tts.meta()
+        loaded = []
+        for script in self.scripts:
+            try:
+                script.script = load_script(script.path, meta)
+            except (LookupError, OSError, TypeError, ValueError) as e:
+                self.fail(script, e)
+            else:
+                self.queue(script)
+                loaded.append(script)
+        with tempfile.TemporaryDirectory() as rendered:
+            self.rendered = rendered
+            for script in loaded:
+                if not script.pending:
+                    self.start(script)
+            try:
+                await (
+                    self.tts.render_pool(
+                        self.lines,
+                        rendered,
+                        self.jobs,
+                        self.line_rendered))
+            except ValueError as e:
+                self.report("error", message=f"{e}")
+            for script in loaded:
+                self.start(script)
+            await asyncio.gather(*self.generating)
+        elapsed = time.monotonic() - started
+        lines = sum(script.lines for script in loaded)
+        self.report(
+            "done",
+            scripts=len(self.scripts),
+            failed=self.failed,
+            lines=lines,
+            distinct=len(self.lines),
+            synthesized=self.synthesized,
+            elapsed=elapsed,
+            throughput=(
+                lines / elapsed
+                    if elapsed > 0
+                    else 0.0),
+            slowest=[
+                {
+                    "script": f"{self.sources[index][0].path}",
+                    "line": self.sources[index][1] + 1,
+                    "text": self.lines[index]["text"],
+                    "voice": self.lines[index]["voice"],
+                    "elapsed": seconds,
+                }
+                    for seconds, index
+                    in sorted(self.times, reverse=True)
+            ])
+        return not self.failed
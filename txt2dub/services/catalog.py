@@ -0,0 +1,72 @@
+import contextlib
+import json
+import os
+from .paths import user_cache_dir
+
+
+class VoiceCatalog(object):
+    """A persistent cache of the voices available from the text-to-speech
+    driver, keyed by driver class and txt2dub version.
+
+    The catalog remembers which driver each engine was last started with,
+    so that its entry can be loaded before the engine has been started to
+    find out its driver.
+    """
+
+    def __init__(self, path=None):
+        """Create a voice catalog.
+
+        `path`
+            the catalog file, defaulting to `voices.json` in the
+            user's txt2dub cache directory
+        """
+        self.path = (
+            path
+                if path is not None
+                else user_cache_dir() / "voices.json")
+
+    @staticmethod
+    def key(driver, version):
+        return f"{driver}@{version}"
+
+    def read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def load(self, version, engine):
+        """Returns the interpreter metadata last stored for the `engine`
+        spec and `version`, or `None` if there isn't any."""
+
+        data = self.read()
+        driver = data.get("engines", {}).get(engine)
+        entry = data.get("entries", {}).get(self.key(driver, version))
+        if (isinstance(entry, dict) and
+            entry.get("driver") == driver and
+            entry.get("version") == version):
+
+            return entry
+
+    def save(self, meta, engine):
+        """Stores interpreter metadata from the `engine` spec, replacing
+        the catalog file atomically."""
+
+        data = self.read()
+        key = self.key(meta["driver"], meta["version"])
+        data.setdefault("entries", {})[key] = meta
+        data.setdefault("engines", {})[engine] = meta["driver"]
+        data.pop("last", None)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
@@ -0,0 +1,126 @@
+import re
+
+
+IMPORT_SUFFIXES = (".txt", ".srt", ".md", ".markdown",)
+
+SENTENCE = re.compile(
+    r"\S.*?(?:[.!?…]+[\"'”’)\]]*(?=\s|$)|$)",
+    re.DOTALL)
+SRT_TIMING = re.compile(r"^\s*\d+:\d+:\d+[,.]\d+\s*-->")
+SRT_TAG = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+MARKDOWN_BLOCK = re.compile(r"^(?:(#{1,6})\s+|>\s?|[-*+]\s+|\d+[.)]\s+)")
+MARKDOWN_BREAK = re.compile(r"^(?:(?:[-*_]\s*){3,}|=+)$")
+MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+MARKDOWN_MARKUP = re.compile(r"<[^>]*>|[*`~]+|(?<!\w)_+|_+(?!\w)")
+
+
+def text_paragraphs(lines):
+    """Yields the paragraphs of plain text, separated by blank lines."""
+
+    paragraph = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            paragraph.append(line)
+        elif paragraph:
+            yield " ".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield " ".join(paragraph)
+
+
+def srt_paragraphs(lines):
+    """Yields the text of each cue of SubRip subtitles, without their
+    numbers, timings or formatting tags."""
+
+    cue = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if cue:
+                yield " ".join(cue)
+                cue = []
+        elif SRT_TIMING.match(line):
+            cue = []
+        else:
+            text = SRT_TAG.sub("", line).strip()
+            if text:
+                cue.append(text)
+    if cue:
+        yield " ".join(cue)
+
+
+def markdown_paragraphs(lines):
+    """Yields the paragraphs, headings and list items of Markdown text,
+    without its markup or code blocks."""
+
+    paragraph = []
+    fenced = False
+    quoting = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith(("```", "~~~")):
+            fenced = not fenced
+            line = ""
+        if fenced:
+            continue
+        block = MARKDOWN_BLOCK.match(line)
+        quote = line.startswith(">")
+        if (not line or
+            MARKDOWN_BREAK.match(line) or
+            quote != quoting or (
+                block is not None and
+                not quote)):
+
+            if paragraph:
+                yield " ".join(paragraph)
+                paragraph = []
+        quoting = quote
+        if not line or MARKDOWN_BREAK.match(line):
+            continue
+        if block is not None:
+            line = line[block.end():]
+        line = MARKDOWN_IMAGE.sub("", line)
+        line = MARKDOWN_LINK.sub(r"\1", line)
+        line = MARKDOWN_MARKUP.sub("", line).strip()
+        if line:
+            paragraph.append(line)
+        if block is not None and block.group(1):
+            if paragraph:
+                yield " ".join(paragraph)
+                paragraph = []
+    if paragraph:
+        yield " ".join(paragraph)
+
+
+READERS = {
+    ".srt": srt_paragraphs,
+    ".md": markdown_paragraphs,
+    ".markdown": markdown_paragraphs,
+}
+
+
+def sentences(paragraph):
+    return (
+        match.group(0).strip()
+            for match
+            in SENTENCE.finditer(paragraph))
+
+
+def import_texts(path, split="sentences"):
+    """Yields the texts of script lines imported from the plain text,
+    SubRip or Markdown file at `path`, reading it as a stream.
+
+    `split`
+        `"sentences"` for a line per sentence, or `"paragraphs"` for a
+        line per paragraph, subtitle cue, heading or list item
+    """
+
+    reader = READERS.get(path.suffix.lower(), text_paragraphs)
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for paragraph in reader(f):
+            if split == "paragraphs":
+                yield paragraph
+            else:
+                yield from sentences(paragraph)
@@ -0,0 +1,178 @@
+import contextlib
+import json
+import os
+from ..models.script import ScriptVoiceModel
+
+
+JOURNAL_FORMAT = "txt2dub-journal"
+
+
+def journal_path(path):
+    return path.with_name(f".{path.name}.journal")
+
+
+def base_of(path):
+    """Returns what identifies the saved script at `path` that a journal
+    applies to."""
+
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ScriptJournal(object):
+    """An append-only journal of the edits made to a script since it was
+    last saved, kept beside the script file.
+
+    Edits are recorded by `ScriptModel` as operations on line positions,
+    `text`, `voice`, `insert` and `delete`, one line of JSON each, so
+    recording an edit takes time in proportion to the edit rather than the
+    script. The first line identifies the save the edits apply to, so that
+    a journal isn't replayed over a script that was saved or changed
+    without it.
+    """
+
+    def __init__(self, path):
+        """Create a journal for the script file at `path`."""
+
+        self.path = path
+        self.file = None
+        self.offset = 0
+
+    @property
+    def exists(self):
+        return journal_path(self.path).exists()
+
+    def open(self):
+        """Starts recording edits, keeping any edits recorded before."""
+
+        if self.file is None:
+            self.file = open(journal_path(self.path), "ab")
+            self.offset = self.file.tell()
+            if not self.offset:
+                self.write(
+                    {
+                        "format": JOURNAL_FORMAT,
+                        "base": base_of(self.path),
+                    })
+        return self
+
+    def write(self, record):
+        data = (
+            json.dumps(
+                record,
+                ensure_ascii=False,
+                separators=(",", ":")) + "\n").encode("utf-8")
+        self.file.write(data)
+        self.file.flush()
+        self.offset += len(data)
+
+    def record(self, op, *args):
+        try:
+            self.open().write([op, *args])
+        except OSError:
+            pass
+
+    def replay(self, script):
+        """Applies the edits in the journal of the saved `script`, returning
+        whether there were any.
+
+        Replay stops at the first edit that can't be applied, like one
+        left half-written by a crash, and the journal is truncated there so
+        that later edits are recorded after the ones that were replayed.
+        """
+
+        try:
+            f = open(journal_path(self.path), "r+b")
+        except OSError:
+            return False
+        with f:
+            try:
+                header = json.loads(f.readline())
+                if (header.get("format") != JOURNAL_FORMAT or
+                    header.get("base") != base_of(self.path)):
+
+                    return False
+            except (OSError, ValueError, AttributeError):
+                return False
+            replayed = False
+            offset = f.tell()
+            line = f.readline()
+            while line:
+                try:
+                    self.apply(script, json.loads(line))
+                except (ValueError, LookupError, TypeError):
+                    f.truncate(offset)
+                    break
+                replayed = True
+                offset = f.tell()
+                line = f.readline()
+            return replayed
+
+    @staticmethod
+    def apply(script, record):
+        op, n, *args = record
+        if op == "text":
+            script.line_at(n).text = args[0]
+        elif op == "voice":
+            script.line_at(n).voice = (
+                ScriptVoiceModel.deserialize(script, args[0]))
+        elif op == "insert":
+            first, last = script.load(args[0])
+            if first is None:
+                return
+            if n < len(script):
+                script.splice(first, last, before=script.line_at(n))
+            else:
+                script.splice(first, last)
+        elif op == "delete":
+            script.cut(script.line_at(n), script.line_at(args[0] - 1))
+        else:
+            raise ValueError(f"Unknown journal operation {op!r}")
+
+    def compact(self, offset, path=None):
+        """Drops the edits recorded before `offset`, which were just saved
+        to `path`, or to this journal's script file, and keeps recording
+        edits for that file."""
+
+        old = journal_path(self.path)
+        new = journal_path(path or self.path)
+        tail = b""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            with contextlib.suppress(OSError):
+                with open(old, "rb") as f:
+                    f.seek(offset)
+                    tail = f.read()
+        with contextlib.suppress(OSError):
+            os.remove(old)
+        self.path = path or self.path
+        self.offset = 0
+        if tail:
+            tmp = new.with_name(f"{new.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    header = {
+                        "format": JOURNAL_FORMAT,
+                        "base": base_of(self.path),
+                    }
+                    f.write(
+                        json.dumps(header, separators=(",", ":"))
+                            .encode("utf-8") + b"\n")
+                    f.write(tail)
+                os.replace(tmp, new)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+
+    def discard(self):
+        """Deletes the journal, for when edits are abandoned."""
+
+        self.close()
+        with contextlib.suppress(OSError):
+            os.remove(journal_path(self.path))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,27 @@
+import os
+import pathlib
+import platform
+
+
+def user_cache_dir():
+    """Returns the directory for txt2dub's per-user caches.
+
+    The `TXT2DUB_CACHE_DIR` environment variable takes precedence over
+    the platform's usual location for application caches.
+    """
+
+    override = os.environ.get("TXT2DUB_CACHE_DIR")
+    if override:
+        return pathlib.Path(override)
+    system = platform.system()
+    if system == "Windows":
+        base = (
+            os.environ.get("LOCALAPPDATA") or
+            pathlib.Path.home() / "AppData" / "Local")
+    elif system == "Darwin":
+        base = pathlib.Path.home() / "Library" / "Caches"
+    else:
+        base = (
+            os.environ.get("XDG_CACHE_HOME") or
+            pathlib.Path.home() / ".cache")
+    return pathlib.Path(base) / "txt2dub"
@@ -0,0 +1,350 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+from ..tts.engines import selected_engine
+from .transport import ProcessTransport, SocketTransport
+from .tts import default_jobs
+
+
+QUEUE_SIZE = 64
+ENGINE_COMMANDS = ("play", "render", "generate",)
+STREAM_COMMANDS = ("lines", "end",)
+
+
+class ServiceClient(object):
+    """A client connected to the render service."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.closed = False
+        self.stops = 0
+        self.jobs = {}
+        self.streaming = set()
+
+    def respond(self, response):
+        if not self.closed:
+            self.writer.write(
+                (json.dumps(response, separators=(",", ":")) + "\n")
+                    .encode("utf-8"))
+
+    def error(self, request, message):
+        self.respond(
+            {
+                "id": request.get("id"),
+                "type": "error",
+                "value": message,
+            })
+
+
+class ServiceJob(object):
+    """A streaming request of a client, and the stream requests waiting
+    for it to reach an interpreter."""
+
+    def __init__(self):
+        self.worker = None
+        self.id = None
+        self.pending = []
+        self.ended = False
+
+
+class ServiceWorker(object):
+    """An interpreter process of the render service's pool.
+
+    Requests are forwarded to the interpreter with ids of its own, and its
+    responses are sent back to their clients with the clients' ids.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.client = None
+
+    async def start(self):
+        self.transport = await ProcessTransport.start()
+        self.pending = {}
+        asyncio.ensure_future(self.read(self.transport, self.pending))
+
+    async def restart(self):
+        """Stops the interpreter, e.g. when it is left waiting for the
+        stream of a client that disconnected. It is started again before
+        its next request."""
+
+        if self.transport is not None:
+            await self.transport.close()
+
+    async def read(self, transport, pending):
+        try:
+            more = True
+            while more:
+                try:
+                    line = await transport.readline()
+                except (ConnectionError, ValueError):
+                    line = b""
+                if line:
+                    with contextlib.suppress(AttributeError, ValueError):
+                        self.respond(pending, json.loads(line))
+                else:
+                    more = False
+        finally:
+            if self.transport is transport:
+                self.transport = None
+            for client, id, done in pending.values():
+                if client is not None:
+                    client.error({"id": id}, "TTS engine disconnected")
+                if done is not None and not done.done():
+                    done.set_result(None)
+            pending.clear()
+
+    def respond(self, pending, response):
+        entry = pending.get(response.get("id"))
+        if entry is not None:
+            client, id, done = entry
+            if client is not None:
+                client.respond(dict(response, id=id))
+            if response.get("type") != "event":
+                del pending[response["id"]]
+                if done is not None and not done.done():
+                    done.set_result(None)
+
+    async def send(self, client, request, wait=False):
+        """Forwards `request` from `client`, whose responses are dropped
+        if it's `None`. Returns the interpreter's id for the request, and a
+        future that's done when it's answered if `wait` is set."""
+
+        id = next(self.ids)
+        done = (
+            asyncio.get_running_loop().create_future()
+                if wait
+                else None)
+        if self.transport is None:
+            if client is not None:
+                client.error(request, "TTS engine disconnected")
+            if done is not None:
+                done.set_result(None)
+            return id, done
+        self.pending[id] = (client, request.get("id"), done)
+        message = dict(request, id=id)
+        with contextlib.suppress(ConnectionError):
+            await (
+                self.transport.write(
+                    (json.dumps(message) + "\n").encode("utf-8")))
+        return id, done
+
+
+class RenderService(object):
+    """A local render service, sharing a pool of warm interpreter
+    processes between every txt2dub instance and script tool on the
+    machine.
+
+    Clients connect over a Unix socket and speak the interpreter's own
+    protocol, so a `TTSInterface` can use the service in place of a
+    private interpreter. Engine commands wait in a queue for the next idle
+    interpreter, and reading from a client waits while the queue is full,
+    unless one of its streaming requests is running on an interpreter and
+    waiting for the rest of its stream. Other commands are answered right
+    away.
+
+    The `engine` command answers with the engine spec the interpreters
+    were started with, so that clients selecting another engine can start
+    their own interpreters instead.
+    """
+
+    def __init__(self, address, jobs=None, queue_size=QUEUE_SIZE):
+        """Create a render service.
+
+        `address`
+            the Unix socket path to listen on. Clients can write files
+            wherever the service can, so its socket is only accessible to
+            its user
+        `jobs`
+            the number of interpreter processes, defaulting to the number
+            of CPU cores
+        `queue_size`
+            the number of engine requests that can wait for an
+            interpreter
+        """
+        self.address = address
+        self.engine = selected_engine()
+        self.jobs = jobs or default_jobs()
+        self.queue_size = queue_size
+        self.queue = None
+        self.changed = None
+        self.workers = []
+        self.dispatchers = []
+        self.server = None
+
+    async def start(self):
+        with contextlib.suppress(OSError):
+            transport = await SocketTransport.connect(self.address)
+            await transport.close()
+            raise ValueError(
+                f"A render service is already running at {self.address}")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.address)
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)),
+                    exist_ok=True)
+        self.queue = asyncio.Queue()
+        self.changed = asyncio.Condition()
+        self.workers = [ServiceWorker() for _ in range(self.jobs)]
+        for worker in self.workers:
+            await worker.start()
+        self.dispatchers = [
+            asyncio.ensure_future(self.dispatch(worker))
+                for worker
+                in self.workers
+        ]
+        umask = os.umask(0o177)
+        try:
+            self.server = (
+                await (
+                    asyncio.start_unix_server(
+                        self.serve,
+                        f"{self.address}")))
+        finally:
+            os.umask(umask)
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            with contextlib.suppress(OSError):
+                os.remove(self.address)
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        for worker in self.workers:
+            await worker.restart()
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def enqueue(self, client, item):
+        """Queues an engine request from `client`, waiting while the queue
+        is full. A client with a streaming request running doesn't wait,
+        since its stream is read along with its other requests."""
+
+        async with self.changed:
+            await (
+                self.changed.wait_for(
+                    lambda: (
+                        client.streaming or
+                        self.queue.qsize() < self.queue_size)))
+            self.queue.put_nowait(item)
+
+    async def dispatch(self, worker):
+        """Runs queued engine requests on `worker`, one at a time."""
+
+        while True:
+            client, request, stops, job = await self.queue.get()
+            await self.notify()
+            if client.closed:
+                continue
+            if request.get("command") == "play" and stops != client.stops:
+                client.respond(
+                    {
+                        "id": request.get("id"),
+                        "type": "result",
+                        "value": "cancelled",
+                    })
+                continue
+            if worker.transport is None:
+                try:
+                    await worker.start()
+                except OSError as e:
+                    client.error(request, f"{e}")
+                    continue
+            worker.client = client
+            id, done = await worker.send(client, request, wait=True)
+            if job is not None:
+                job.worker = worker
+                job.id = id
+                if not job.ended:
+                    client.streaming.add(job)
+                    await self.notify()
+                pending, job.pending = job.pending, ()
+                for message in pending:
+                    await worker.send(client, dict(message, job=id))
+            await done
+            if job is not None:
+                client.streaming.discard(job)
+            worker.client = None
+
+    async def handle(self, client, request):
+        command = request.get("command")
+        if command in ENGINE_COMMANDS:
+            job = None
+            if request.get("stream"):
+                job = client.jobs[request.get("id")] = ServiceJob()
+            await self.enqueue(client, (client, request, client.stops, job))
+        elif command in STREAM_COMMANDS:
+            job = client.jobs.get(request.get("job"))
+            if job is None:
+                client.error(request, f"Unknown job {request.get('job')}")
+            elif job.worker is None:
+                job.pending.append(request)
+            else:
+                await job.worker.send(client, dict(request, job=job.id))
+            if command == "end" and job is not None:
+                job.ended = True
+                client.jobs.pop(request.get("job"), None)
+                client.streaming.discard(job)
+        elif command == "engine":
+            client.respond(
+                {
+                    "id": request.get("id"),
+                    "type": "result",
+                    "value": self.engine,
+                })
+        elif command == "stop":
+            client.stops += 1
+            for worker in self.workers:
+                if worker.client is client:
+                    await worker.send(None, {"command": "stop"})
+            client.respond(
+                {
+                    "id": request.get("id"),
+                    "type": "result",
+                    "value": "ok",
+                })
+        else:
+            worker = min(
+                (
+                    worker
+                        for worker
+                        in self.workers
+                        if worker.transport is not None),
+                key=lambda worker: len(worker.pending),
+                default=self.workers[0])
+            await worker.send(client, request)
+
+    async def serve(self, reader, writer):
+        client = ServiceClient(writer)
+        try:
+            more = True
+            while more:
+                line = await reader.readline()
+                if line:
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError("Requests must be JSON objects")
+                    except ValueError as e:
+                        client.respond({"type": "error", "value": f"{e}"})
+                    else:
+                        await self.handle(client, request)
+                else:
+                    more = False
+        except ConnectionError:
+            pass
+        finally:
+            client.closed = True
+            for job in client.jobs.values():
+                if job.worker is not None:
+                    await job.worker.restart()
+            writer.close()
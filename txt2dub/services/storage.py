@@ -0,0 +1,292 @@
+import contextlib
+import itertools
+import json
+import os
+import re
+from ..models.script import ScriptModel
+
+
+SCRIPT_SUFFIXES = (".txt2dub", ".json",)
+GENERATED_SUFFIXES = (".txt2dub", ".zip",)
+LINES_FORMAT = "txt2dub-lines"
+FORMATS = ("json", "lines",)
+SEPARATORS = (",", ":")
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def is_script(path):
+    return path.suffixes[-len(SCRIPT_SUFFIXES):] == list(SCRIPT_SUFFIXES)
+
+
+def generated_path(path):
+    """Returns the default path of the audio generated for the script at
+    `path`, beside it."""
+
+    name = (
+        path.name[:-len("".join(SCRIPT_SUFFIXES))]
+            if is_script(path)
+            else path.stem)
+    return path.with_name(f"{name}{''.join(GENERATED_SUFFIXES)}")
+
+
+def script_format():
+    """Returns the format scripts are saved in, from the
+    `TXT2DUB_SCRIPT_FORMAT` environment variable: `json` (the default)
+    for a single minified JSON document, or `lines` for a header and a
+    line of JSON per script line, which only this and later versions of
+    txt2dub can load."""
+
+    format = os.environ.get("TXT2DUB_SCRIPT_FORMAT", "json")
+    return (
+        format
+            if format in FORMATS
+            else "json")
+
+
+def snapshot(script):
+    """Returns the contents of `script` to save, quickly enough to take on
+    the UI event loop. Line text and voices are immutable, so they are
+    shared rather than copied."""
+
+    return (
+        script.meta.version,
+        script.meta.driver,
+        [(line.text, line.voice) for line in script])
+
+
+def encode(snapshot, format="json"):
+    """Yields the text of a saved script in chunks, from a `snapshot`."""
+
+    version, driver, lines = snapshot
+    voices = {}
+
+    def encode_line(text, voice):
+        if voice not in voices:
+            voices[voice] = json.dumps(voice.serialize(), separators=SEPARATORS)
+        return (
+            f'{{"text":{json.dumps(text, ensure_ascii=False)},' \
+            f'"voice":{voices[voice]}}}')
+
+    if format == "json":
+        header = {"version": version, "driver": driver}
+        yield json.dumps(header, separators=SEPARATORS)[:-1]
+        yield ',"lines":['
+        for n, (text, voice) in enumerate(lines):
+            yield (
+                f",{encode_line(text, voice)}"
+                    if n
+                    else encode_line(text, voice))
+        yield "]}\n"
+    else:
+        header = {"format": LINES_FORMAT, "version": version, "driver": driver}
+        yield json.dumps(header, separators=SEPARATORS) + "\n"
+        for text, voice in lines:
+            yield encode_line(text, voice) + "\n"
+
+
+def sync_directory(path):
+    if os.name != "nt":
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def save_script(path, snapshot, format="json"):
+    """Saves a script `snapshot` to `path` atomically: it is written to a
+    temporary file beside it, synced to disk, then renamed over `path`, so
+    a crash leaves either the old or the new script."""
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.writelines(encode(snapshot, format))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    with contextlib.suppress(OSError):
+        sync_directory(path.parent)
+
+
+class JSONStream(object):
+    """Decodes a JSON document from a text file a value at a time, reading
+    it in chunks, so that long arrays can be streamed."""
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        data = self.f.read(self.CHUNK_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def rest(self):
+        """Returns the text read but not decoded yet, up to the end of its
+        line, so that the rest of the file can be read by line."""
+
+        rest = self.buffer[self.pos:] + self.f.readline()
+        self.buffer = ""
+        self.pos = 0
+        return rest
+
+    def peek(self):
+        """Returns the next character that isn't whitespace, or `""` at the
+        end of the file."""
+
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next value. A value is only complete once the
+        character after it has been read, or the file has ended."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    def items(self):
+        """Yields the values of the next array."""
+
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            if char not in (",", "]",):
+                raise ValueError(f"Expected ',' or ']' at {self.pos}")
+            self.pos += 1
+            if char == "]":
+                return
+
+    def script(self):
+        """Yields the fields of a script before its lines, then each of its
+        lines."""
+
+        self.expect("{")
+        header = {}
+        lines = False
+        while self.peek() != "}":
+            key = self.value()
+            self.expect(":")
+            if key == "lines" and not lines:
+                lines = True
+                yield header
+                yield from self.items()
+            else:
+                header[key] = self.value()
+            char = self.peek()
+            if char not in (",", "}",):
+                raise ValueError(f"Expected ',' or '}}' at {self.pos}")
+            if char == ",":
+                self.pos += 1
+        self.pos += 1
+        if not lines:
+            yield header
+
+
+def iter_script(path):
+    """Yields the fields of the script saved at `path`, apart from its lines,
+    then each of its lines, serialized. The file is parsed incrementally,
+    in any format."""
+
+    with open(path, "r", encoding="utf-8") as f:
+        stream = JSONStream(f)
+        fields = stream.script()
+        header = next(fields)
+        yield header
+        if header.get("format") == LINES_FORMAT:
+            for line in itertools.chain(stream.rest().split("\n"), f):
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from fields
+
+
+def load_script(path, meta):
+    """Loads a script saved in any format, including the indented JSON of
+    earlier versions."""
+
+    lines = iter_script(path)
+    try:
+        return ScriptModel.deserialize(dict(next(lines), lines=lines), meta)
+    finally:
+        lines.close()
+
+
+class ScriptLoader(object):
+    """Loads a saved script progressively: the first page of lines right
+    away, so that it can be shown, then the rest in chunks.
+
+    Chunks are read with `read`, which can run in a thread, and added to the
+    end of the script with `add`. Closing the loader while a chunk is being
+    read leaves the file to be closed when the loader is collected.
+    """
+
+    FIRST_PAGE = 100
+    CHUNK_SIZE = 5000
+
+    def __init__(self, path, meta):
+        self.lines = iter_script(path)
+        header = next(self.lines)
+        self.script = (
+            ScriptModel.deserialize(
+                dict(
+                    header,
+                    lines=itertools.islice(self.lines, self.FIRST_PAGE)),
+                meta))
+        self.done = len(self.script) < self.FIRST_PAGE
+
+    def read(self):
+        """Returns the first and last lines of the next chunk, linked to each
+        other, or `None` for both when all lines have been read."""
+
+        if self.done:
+            return None, None
+        first, last = (
+            self.script.load(
+                itertools.islice(self.lines, self.CHUNK_SIZE)))
+        if first is None:
+            self.done = True
+        return first, last
+
+    def add(self, first, last):
+        self.script.splice(first, last)
+
+    def close(self):
+        self.done = True
+        with contextlib.suppress(ValueError):
+            self.lines.close()
@@ -0,0 +1,119 @@
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sys
+from ..tts.engines import selected_engine
+from .paths import user_cache_dir
+
+
+CLOSE_TIMEOUT = 5
+
+
+def service_address():
+    """Returns the Unix socket path of the local render service, from the
+    `TXT2DUB_RENDER_SERVICE` environment variable. It defaults to
+    `render.sock` in the cache directory, and can be set to `0` to never
+    use a service. Returns `None` for no service, which is always the
+    case where Unix sockets aren't supported."""
+
+    address = os.environ.get("TXT2DUB_RENDER_SERVICE")
+    if not hasattr(socket, "AF_UNIX") or address in ("", "0",):
+        return None
+    if address is None:
+        return user_cache_dir() / "render.sock"
+    return address
+
+
+class Transport(object):
+    """A connection to an interpreter, which requests are written to and
+    responses are read from, as lines of JSON."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def readline(self):
+        return await self.reader.readline()
+
+    async def write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def close(self):
+        raise NotImplementedError()
+
+
+class ProcessTransport(Transport):
+    """A private interpreter process, talked to over its standard input
+    and output."""
+
+    def __init__(self, process):
+        super().__init__(process.stdout, process.stdin)
+        self.process = process
+
+    @classmethod
+    async def start(cls):
+        return (
+            cls(
+                await (
+                    asyncio.create_subprocess_exec(
+                        sys.executable,
+                        "-m",
+                        "txt2dub.tts.__main__",
+                        stdin=asyncio.subprocess.PIPE,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE))))
+
+    async def close(self):
+        """Terminates the process and waits for it to exit, killing it if
+        it's still busy after `CLOSE_TIMEOUT` seconds."""
+
+        with contextlib.suppress(ProcessLookupError):
+            self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), CLOSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            with contextlib.suppress(ProcessLookupError):
+                self.process.kill()
+            await self.process.wait()
+
+
+class SocketTransport(Transport):
+    """A connection to the local render service."""
+
+    @classmethod
+    async def connect(cls, address):
+        reader, writer = await asyncio.open_unix_connection(f"{address}")
+        return cls(reader, writer)
+
+    async def engine(self):
+        """Returns the engine spec the service renders with."""
+
+        await self.write(
+            (json.dumps({"id": 0, "command": "engine"}) + "\n")
+                .encode("utf-8"))
+        return json.loads(await self.readline()).get("value")
+
+    async def close(self):
+        self.writer.close()
+        with contextlib.suppress(OSError):
+            await self.writer.wait_closed()
+
+
+async def open_transport(address=None, engine=None):
+    """Connects to the render service at `address` when it's running with
+    the `engine` spec, which defaults to the selected engine, or else
+    starts a private interpreter process."""
+
+    if address is not None:
+        with contextlib.suppress(OSError):
+            transport = await SocketTransport.connect(address)
+            try:
+                if await transport.engine() == (engine or selected_engine()):
+                    return transport
+            except (AttributeError, ValueError):
+                pass
+            await transport.close()
+    return await ProcessTransport.start()
@@ -1,66 +1,245 @@
 import asyncio
+import contextlib
+import itertools
 import json
-import sys
+import os
+import tempfile
+import time
+from .. import __version__
 from ..models import ScriptMetadata, ScriptVoiceMetadata
+from ..tts.cache import normalize_text
+from ..tts.engines import selected_engine
+from .transport import open_transport, service_address
+
+
+RENDER_BATCH_SIZE = 8
+STREAM_CHUNK_SIZE = 64
+
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+
+class GenerateProgress(object):
+    """The progress of a generate job, tracked from interpreter events.
+
+    When lines are rendered on a pool of interpreters first, they're
+    counted in `rendered` until the job starts writing them, and then in
+    `done` as they're written.
+    """
+
+    def __init__(self, total, callback=None):
+        """Create generate progress.
+
+        `total`
+            the number of script lines with audio
+        `callback`
+            an optional function called with this progress and the
+            event after each update
+        """
+        self.total = total
+        self.callback = callback
+        self.rendering = 0
+        self.rendered = set()
+        self.done = set()
+        self.bytes = 0
+        self.duration = 0.0
+        self.started = time.monotonic()
+        self.summary = None
+
+    @property
+    def phase(self):
+        """`"render"` while lines are rendered on the pool, and then
+        `"write"`."""
+
+        return (
+            "render"
+                if len(self.rendered) < self.rendering and not self.done
+                else "write")
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        """The number of lines written per second."""
+
+        elapsed = self.elapsed
+        return (
+            len(self.done) / elapsed
+                if elapsed > 0
+                else 0.0)
+
+    def update(self, indexes, event):
+        indexes = [index for index in indexes if index is not None]
+        if event.get("event") == "line":
+            self.done.update(indexes)
+            self.bytes += event.get("bytes") or 0
+            self.duration += event.get("duration") or 0.0
+        else:
+            self.rendered.update(indexes)
+        if self.callback is not None:
+            self.callback(self, event)
 
 
 class TTSInterface(object):
     """The asynchronous text-to-speech interface."""
 
-    def __init__(self, runner):
+    def __init__(self, runner, jobs=None, catalog=None, connect=None):
+        """Create a text-to-speech interface.
+
+        `runner`
+            a function that runs a coroutine in the background and
+            returns a function for awaiting its result
+        `jobs`
+            the default number of interpreter processes used for
+            generating, defaulting to the number of CPU cores
+        `catalog`
+            an optional `VoiceCatalog` for loading voices before the
+            interpreter is ready
+        `connect`
+            an optional coroutine function returning the `Transport` to
+            the interpreter, defaulting to the local render service when
+            it's running, or else a private interpreter process
+        """
         self.runner = runner
-        self.await_process = None
+        self.jobs = jobs or default_jobs()
+        self.catalog = catalog
+        self.engine = selected_engine()
+        self.connect = connect or self.open_transport
+        self.await_transport = None
+        self.await_reader = None
+        self.reading = False
         self.lock = asyncio.Lock()
+        self.ids = itertools.count(1)
+        self.responses = {}
+        self.listeners = {}
+        self.workers = []
+        self.metadata = None
+        self.metadata_fresh = False
+        self.metadata_lock = asyncio.Lock()
 
     @property
-    def process(self):
-        if self.await_process is None:
-            self.await_process = (
-                self.runner(
-                    asyncio.create_subprocess_exec(
-                        sys.executable,
-                        "-m",
-                        "txt2dub.tts.__main__",
-                        stdin=asyncio.subprocess.PIPE,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE)))
-        return self.await_process()
+    def transport(self):
+        if self.await_transport is None:
+            self.await_transport = self.runner(self.start())
+        return self.await_transport()
 
-    async def writeline(self, value):
-        try:
-            process = await self.process
-            process.stdin.write(f"{value}\n".encode("utf-8"))
-        except ValueError:
-            pass
+    @staticmethod
+    def open_transport():
+        return open_transport(service_address())
 
-    async def readline(self):
+    async def start(self):
         try:
-            process = await self.process
-            return (
-                (await process.stdout.readline())
-                .decode("utf-8"))
-        except ValueError:
-            pass
+            transport = await self.connect()
+        except OSError:
+            raise ValueError("TTS engine unavailable")
+        self.reading = True
+        self.await_reader = self.runner(self.read_responses(transport))
+        return transport
 
-    async def request(self, **kwargs):
+    async def writeline(self, value):
+        transport = await self.transport
         async with self.lock:
-            await self.writeline(json.dumps(kwargs))
-            response = await self.readline()
-            if response:
-                result = json.loads(response)
-                if result and "type" in result and result["type"] == "result":
-                    return result["value"]
+            try:
+                await transport.write(f"{value}\n".encode("utf-8"))
+            except (ConnectionError, ValueError):
+                raise ValueError("TTS engine disconnected")
+
+    async def read_responses(self, transport):
+        """Routes responses from the interpreter to their requests until
+        it disconnects."""
+
+        try:
+            more = True
+            while more:
+                try:
+                    line = await transport.readline()
+                except (ConnectionError, ValueError):
+                    line = b""
+                if line:
+                    try:
+                        self.respond(json.loads(line.decode("utf-8")))
+                    except (AttributeError, ValueError):
+                        pass
                 else:
-                    raise (
-                        ValueError(
-                            result["value"]
-                                if "value" in result
-                                else "Unknown TTS engine error"))
+                    more = False
+        finally:
+            self.reading = False
+            for response in self.responses.values():
+                if not response.done():
+                    response.set_exception(
+                        ValueError("TTS engine disconnected"))
+
+    def respond(self, result):
+        if result.get("type") == "event":
+            listener = self.listeners.get(result.get("id"))
+            if listener is not None:
+                listener(result.get("value"))
+            return
+        response = self.responses.get(result.get("id"))
+        if response is not None and not response.done():
+            if result.get("type") == "result":
+                response.set_result(result.get("value"))
             else:
+                response.set_exception(
+                    ValueError(
+                        result["value"]
+                            if "value" in result
+                            else "Unknown TTS engine error"))
+
+    async def request(self, events=None, stream=None, **kwargs):
+        """Sends a request to the interpreter and returns its result.
+
+        `events`
+            an optional function called with each event the interpreter
+            emits for this request
+        `stream`
+            optional script lines to stream to the interpreter in chunks
+            after the request, for commands that accept a stream
+        """
+        id = next(self.ids)
+        response = asyncio.get_running_loop().create_future()
+        self.responses[id] = response
+        if events is not None:
+            self.listeners[id] = events
+        try:
+            message = dict(kwargs, id=id)
+            if stream is not None:
+                message["stream"] = True
+            await self.writeline(json.dumps(message))
+            if stream is not None:
+                await self.stream_lines(id, stream, response)
+            if not self.reading and not response.done():
                 raise ValueError("TTS engine disconnected")
+            return await response
+        finally:
+            del self.responses[id]
+            self.listeners.pop(id, None)
 
-    async def meta(self):
-        meta = await self.request(command="meta")
+    async def stream_lines(self, id, lines, response):
+        """Streams `lines` to the job `id` in chunks. Streaming stops early
+        if a chunk is refused, like when the job has already failed, since
+        its `response` then tells why."""
+
+        chunk = []
+        try:
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) == STREAM_CHUNK_SIZE:
+                    await self.request(command="lines", job=id, lines=chunk)
+                    chunk = []
+                    if response.done():
+                        return
+            if chunk:
+                await self.request(command="lines", job=id, lines=chunk)
+            await self.request(command="end", job=id)
+        except ValueError:
+            pass
+
+    @staticmethod
+    def metadata_from(meta):
         return (
             ScriptMetadata(
                 meta["version"],
@@ -73,6 +252,54 @@ class TTSInterface(object):
                         in meta["voices"]
                 ]))
 
+    def cached_meta(self):
+        """Returns the session's `ScriptMetadata` without waiting for the
+        interpreter, loading the engine's last voices from the voice
+        catalog if needed. Returns `None` if no metadata is available yet.
+
+        Voices from the catalog may be stale until `refresh_meta` has
+        checked them with the interpreter.
+        """
+
+        if self.metadata is None and self.catalog is not None:
+            meta = self.catalog.load(__version__, self.engine)
+            if meta is not None:
+                try:
+                    self.metadata = self.metadata_from(meta)
+                except (KeyError, TypeError):
+                    pass
+        return self.metadata
+
+    async def refresh_meta(self):
+        """Requests the `ScriptMetadata` from the interpreter, keeps it for
+        the session and stores it in the voice catalog."""
+
+        async with self.metadata_lock:
+            if not self.metadata_fresh:
+                meta = await self.request(command="meta")
+                metadata = self.metadata_from(meta)
+                if not self.same_meta(self.cached_meta(), metadata):
+                    self.metadata = metadata
+                self.metadata_fresh = True
+                if self.catalog is not None:
+                    self.catalog.save(meta, self.engine)
+        return self.metadata
+
+    @staticmethod
+    def same_meta(a, b):
+        return (
+            a is not None and
+            a.version == b.version and
+            a.driver == b.driver and
+            a.voice_options == b.voice_options)
+
+    async def meta(self):
+        """Returns the `ScriptMetadata` for the session once the
+        interpreter has confirmed it, so that scripts are never loaded or
+        generated with stale voices from the catalog."""
+
+        return await self.refresh_meta()
+
     async def play(self, text, voice, rate):
         return (
             await (
@@ -82,20 +309,191 @@ class TTSInterface(object):
                     voice=voice,
                     rate=rate)))
 
-    async def generate(self, path, script):
+    async def stop(self):
+        return await self.request(command="stop")
+
+    async def render(self, lines, directory=None, events=None):
         return (
             await (
                 self.request(
-                    command="generate",
-                    path=f"{path.absolute()}",
-                    script=script.serialize())))
+                    command="render",
+                    lines=lines,
+                    directory=directory,
+                    events=events)))
+
+    async def prerender(self, lines):
+        """Renders script lines into the cache on a separate interpreter
+        process, so that they can be played without waiting for the
+        engine. Returns the number of lines that were synthesized, or
+        `None` if the lines couldn't be rendered."""
+
+        if not self.workers:
+            self.workers.append(self.worker())
+        try:
+            return await self.workers[0].render(lines)
+        except ValueError:
+            return None
+
+    async def render_parallel(self,
+                              lines,
+                              directory,
+                              jobs,
+                              progress=None,
+                              output=None):
+        """Renders script lines across a pool of `jobs` interpreter
+        processes, rendering each distinct line once.
+
+        `progress`
+            an optional `GenerateProgress` counting the rendered lines
+        `output`
+            an optional `(path, mode)` of the output being generated,
+            whose existing lines are reused instead of rendered
+        """
+
+        unique = {}
+        for n, line in enumerate(lines):
+            text = normalize_text(line["text"])
+            if text:
+                unique.setdefault(
+                    (text, line["voice"]["id"], line["voice"]["rate"]),
+                    (dict(line, index=n), []))[1].append(n)
+        indexes = {
+            line["index"]: group
+                for line, group
+                in unique.values()
+        }
+
+        lines = [line for line, _ in unique.values()]
+        if output is not None and lines:
+            path, mode = output
+            previous = set(
+                await (
+                    self.request(
+                        command="previous",
+                        path=f"{path.absolute()}",
+                        mode=mode,
+                        lines=lines)))
+            lines = [line for n, line in enumerate(lines) if n not in previous]
+
+        if progress is not None:
+            progress.rendering = sum(
+                len(indexes[line["index"]])
+                    for line
+                    in lines)
+
+        def events(event):
+            if progress is not None:
+                progress.update(indexes.get(event.get("index"), ()), event)
+
+        await self.render_pool(lines, directory, jobs, events)
+
+    async def render_pool(self, lines, directory, jobs, events=None):
+        """Renders serialized script lines in batches across a pool of
+        `jobs` interpreter processes. Each process takes the next batch
+        from a shared queue as soon as it's idle, so slow batches don't
+        hold up the others."""
+
+        batches = asyncio.Queue()
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == RENDER_BATCH_SIZE:
+                batches.put_nowait(batch)
+                batch = []
+        if batch:
+            batches.put_nowait(batch)
+        if batches.empty():
+            return
+
+        async def work(worker):
+            while not batches.empty():
+                await worker.render(batches.get_nowait(), directory, events)
+
+        jobs = min(jobs, batches.qsize())
+        while len(self.workers) < jobs - 1:
+            self.workers.append(self.worker())
+        await (
+            asyncio.gather(*(
+                work(worker)
+                    for worker
+                    in [self] + self.workers[:jobs - 1])))
+
+    async def generate(self,
+                       path,
+                       script,
+                       jobs=None,
+                       progress=None,
+                       mode="zip",
+                       compression="stored",
+                       rendered=None):
+        """Generates the audio for a script at `path`, streaming its lines
+        to the interpreter.
+
+        `jobs`
+            the number of interpreter processes to render with,
+            defaulting to `self.jobs`
+        `progress`
+            an optional function called with the `GenerateProgress`
+            and the event, whenever a line is rendered or written
+        `mode`
+            `"zip"` for a zip archive, or `"directory"` for files
+            written in place
+        `compression`
+            the zip compression method, defaulting to `"stored"` since
+            audio is usually compressed already
+        `rendered`
+            an optional directory the script's lines were already
+            rendered into, with `render_pool`, so they aren't rendered
+            again first
+        """
+        jobs = jobs or self.jobs
+        lines = [line.serialize() for line in script]
+        tracker = (
+            GenerateProgress(
+                sum(1 for line in lines if line["text"].strip()),
+                progress))
+
+        def events(event):
+            tracker.update((event.get("index"),), event)
+
+        with contextlib.ExitStack() as stack:
+            if rendered is None and jobs > 1:
+                rendered = stack.enter_context(tempfile.TemporaryDirectory())
+                await (
+                    self.render_parallel(
+                        lines,
+                        rendered,
+                        jobs,
+                        tracker,
+                        (path, mode)))
+            tracker.summary = (
+                await (
+                    self.request(
+                        command="generate",
+                        path=f"{path.absolute()}",
+                        rendered=rendered,
+                        mode=mode,
+                        compression=compression,
+                        events=events,
+                        stream=lines)))
+            return tracker.summary
+
+    def worker(self):
+        """Returns another interface to an interpreter, connected the same
+        way, for rendering in parallel."""
+
+        return self.__class__(self.runner, jobs=1, connect=self.connect)
 
     async def terminate(self):
-        if self.await_process is not None:
-            process = await self.await_process()
-            process.terminate()
-            self.await_process = None
+        for worker in self.workers:
+            await worker.terminate()
+        self.workers = []
+        if self.await_transport is not None:
+            with contextlib.suppress(ValueError):
+                transport = await self.await_transport()
+                await transport.close()
+            self.await_transport = None
 
 
-def create_tts(runner):
-    return TTSInterface(runner)
+def create_tts(runner, jobs=None, catalog=None):
+    return TTSInterface(runner, jobs=jobs, catalog=catalog)
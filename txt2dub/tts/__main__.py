@@ -1,4 +1,48 @@
+import argparse
+import os
+import pathlib
 from .. import __version__
+from .cache import AudioCache, DEFAULT_CACHE_SIZE
+from .engines import create_engine
 from .interpreter import Interpreter
 
-Interpreter(version=__version__).run()
+
+def megabytes(value):
+    return int(float(value) * 1024 * 1024)
+
+
+parser = argparse.ArgumentParser(
+    prog="python -m txt2dub.tts",
+    description="The txt2dub text-to-speech interpreter.")
+parser.add_argument(
+    "--cache-dir",
+    type=pathlib.Path,
+    default=None,
+    help="the rendered audio cache directory " \
+         "(default: an audio directory in $TXT2DUB_CACHE_DIR " \
+         "or the user cache directory)")
+parser.add_argument(
+    "--cache-size",
+    type=megabytes,
+    default=(
+        megabytes(os.environ["TXT2DUB_CACHE_SIZE"])
+            if os.environ.get("TXT2DUB_CACHE_SIZE")
+            else DEFAULT_CACHE_SIZE),
+    help="the rendered audio cache size cap in MB, 0 to disable " \
+         "(default: $TXT2DUB_CACHE_SIZE or 512)")
+parser.add_argument(
+    "--engine",
+    default=None,
+    help="the text-to-speech engine, pyttsx3 or fake, with options like " \
+         "fake:latency=0.05,audio=tone (default: $TXT2DUB_ENGINE or " \
+         "pyttsx3)")
+args = parser.parse_args()
+try:
+    engine = create_engine(args.engine)
+except ValueError as e:
+    parser.error(f"{e}")
+
+Interpreter(
+    version=__version__,
+    cache=AudioCache(args.cache_dir, args.cache_size),
+    engine=engine).run()
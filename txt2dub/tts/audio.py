@@ -0,0 +1,33 @@
+import contextlib
+import warnings
+import wave
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import aifc
+    except ImportError:
+        aifc = None
+
+
+def duration(f):
+    """Returns the duration in seconds of the WAV or AIFF audio in the
+    seekable binary file `f`, or `None` if it can't be determined. The
+    file is rewound afterwards."""
+
+    try:
+        for module in (wave, aifc):
+            if module is not None:
+                f.seek(0)
+                try:
+                    with contextlib.closing(module.open(f, "rb")) as audio:
+                        rate = audio.getframerate()
+                        if rate:
+                            return audio.getnframes() / rate
+                except (EOFError, ValueError, module.Error):
+                    pass
+    except OSError:
+        pass
+    finally:
+        with contextlib.suppress(OSError, ValueError):
+            f.seek(0)
@@ -0,0 +1,161 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unicodedata
+import uuid
+from ..services.paths import user_cache_dir
+
+
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+LOW_WATER_MARK = 0.9
+
+
+def normalize_text(text):
+    """Normalizes text for speech, so that whitespace and unicode
+    composition differences don't change the rendered audio key."""
+
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def audio_key(driver, voice, rate, text, version):
+    """Returns the content address for a rendered line of audio.
+
+    `driver`
+        the qualified name of the pyttsx3 driver class
+    `voice`
+        the voice ID from the TTS driver
+    `rate`
+        the integer rate of speech in words per minute
+    `text`
+        the text to speak, which is normalized before hashing
+    `version`
+        the version of txt2dub
+    """
+    return (
+        hashlib.sha256(
+            json.dumps(
+                [driver, voice, rate, normalize_text(text), version],
+                ensure_ascii=False)
+            .encode("utf-8"))
+        .hexdigest())
+
+
+class AudioCache(object):
+    """A content-addressed, size-capped on-disk cache of rendered audio.
+
+    Entries are evicted least recently used first, using the file
+    modification time which is refreshed on every cache hit. Entries are
+    committed with an atomic rename, so several interpreter processes can
+    share one cache directory.
+    """
+
+    def __init__(self, directory=None, size=DEFAULT_CACHE_SIZE):
+        """Create an audio cache.
+
+        `directory`
+            the cache directory, defaulting to an `audio` directory
+            in the user's txt2dub cache directory
+        `size`
+            the cache size cap in bytes, where `0` disables the cache
+        """
+        self.directory = (
+            directory
+                if directory is not None
+                else user_cache_dir() / "audio")
+        self.size = size
+        self.used = None
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def path(self, key, ext):
+        return self.directory / f"{key}{ext}"
+
+    def get(self, key, ext):
+        """Returns the path to the cached audio for `key`, or `None`
+        for a cache miss."""
+
+        if self.enabled:
+            path = self.path(key, ext)
+            try:
+                os.utime(path)
+                return path
+            except OSError:
+                pass
+
+    @contextlib.contextmanager
+    def scratch(self):
+        """A temporary directory for rendering audio that may be put into
+        the cache. It is created inside the cache directory when possible
+        so that `put` is a rename instead of a copy."""
+
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(
+                    prefix=".scratch-",
+                    dir=self.directory) as tmp_dir:
+                yield tmp_dir
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                yield tmp_dir
+
+    def put(self, key, ext, source):
+        """Moves the rendered audio file at `source` into the cache and
+        returns its cached path. Returns `source` when the cache is
+        disabled or the file cannot be cached."""
+
+        if not self.enabled:
+            return source
+        path = self.path(key, ext)
+        tmp = self.directory / f".{uuid.uuid4().hex}{ext}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            shutil.move(f"{source}", f"{tmp}")
+            os.replace(tmp, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            return source
+        if self.used is not None:
+            with contextlib.suppress(OSError):
+                self.used += path.stat().st_size
+        self.evict()
+        return path
+
+    def entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if (entry.is_file() and
+                        not entry.name.startswith(".")):
+
+                        try:
+                            yield entry.path, entry.stat()
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+
+    def evict(self):
+        """Removes least recently used entries once the cache is over its
+        size cap, until it's down to `LOW_WATER_MARK` of the cap, so that
+        the cache isn't scanned again for every entry put after it's
+        full."""
+
+        if self.used is None:
+            self.used = sum(stat.st_size for _, stat in self.entries())
+        if self.used > self.size:
+            entries = sorted(
+                self.entries(),
+                key=lambda entry: entry[1].st_mtime)
+            self.used = sum(stat.st_size for _, stat in entries)
+            for path, stat in entries:
+                if self.used <= self.size * LOW_WATER_MARK:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                    self.used -= stat.st_size
@@ -0,0 +1,252 @@
+import array
+import math
+import os
+import platform
+import threading
+import time
+import wave
+
+
+DEFAULT_ENGINE = "pyttsx3"
+CHARACTERS_PER_WORD = 6
+
+
+class Engine(object):
+    """A text-to-speech engine, which the interpreter speaks lines with
+    and renders their audio with.
+
+    Lines are queued with `say` or `save`, and `run` speaks or renders
+    them, returning when they are done or `stop` is called.
+    """
+
+    @property
+    def driver(self):
+        """The qualified name of the engine's driver, which rendered audio
+        is cached under."""
+
+        raise NotImplementedError()
+
+    @property
+    def ext(self):
+        """The file extension of rendered audio."""
+
+        raise NotImplementedError()
+
+    def voices(self):
+        """Returns the voices as dictionaries of their `id` and `name`."""
+
+        raise NotImplementedError()
+
+    def say(self, text, voice, rate):
+        raise NotImplementedError()
+
+    def save(self, text, voice, rate, path):
+        raise NotImplementedError()
+
+    def run(self):
+        raise NotImplementedError()
+
+    def stop(self):
+        raise NotImplementedError()
+
+
+class Pyttsx3Engine(Engine):
+    """The system's speech voices, through pyttsx3."""
+
+    def __init__(self):
+        import pyttsx3
+        self.engine = pyttsx3.init()
+
+    @property
+    def driver(self):
+        driver = self.engine.proxy._driver.__class__
+        return f"{driver.__module__}.{driver.__name__}"
+
+    @property
+    def ext(self):
+        return (
+            ".aiff"
+                if platform.system() == "Darwin"
+                else ".mp3")
+
+    def voices(self):
+        return [
+            {
+                "id": voice.id,
+                "name": voice.name
+            }
+                for voice in
+                self.engine.getProperty("voices")
+        ]
+
+    def say(self, text, voice, rate):
+        self.engine.setProperty("voice", voice)
+        self.engine.setProperty("rate", rate)
+        self.engine.say(text)
+
+    def save(self, text, voice, rate, path):
+        self.engine.setProperty("voice", voice)
+        self.engine.setProperty("rate", rate)
+        self.engine.save_to_file(text, f"{path}")
+
+    def run(self):
+        self.engine.runAndWait()
+
+    def stop(self):
+        self.engine.stop()
+
+
+class FakeEngine(Engine):
+    """A deterministic engine for benchmarking and testing without speech
+    voices, which renders silence, or a tone, as WAV audio.
+
+    A line lasts as long as it would take to say its text, at about six
+    characters a word and its rate in words per minute. Speaking a line
+    waits for that long, unless it's stopped, and rendering one takes
+    `latency` seconds.
+    """
+
+    VOICES = (
+        ("fake.low", "Fake Low", 220.0,),
+        ("fake.mid", "Fake Mid", 440.0,),
+        ("fake.high", "Fake High", 880.0,),
+    )
+
+    def __init__(self, latency=0.0, audio="silent", sample_rate=8000):
+        """Create a fake engine.
+
+        `latency`
+            the seconds rendering each line takes
+        `audio`
+            `"silent"`, or `"tone"` for a sine wave at the voice's pitch
+        `sample_rate`
+            the sample rate of rendered audio
+        """
+        if audio not in ("silent", "tone",):
+            raise ValueError(f"Unknown fake audio {audio}")
+        if latency < 0 or sample_rate < 1:
+            raise ValueError("Fake engine options must not be negative")
+        self.latency = latency
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.pending = []
+        self.stopped = threading.Event()
+
+    @property
+    def driver(self):
+        """The engine's name with the options that change its audio, so
+        that audio rendered with other options isn't reused."""
+
+        return (
+            f"{__name__}.{self.__class__.__name__}"
+            f":audio={self.audio},sample_rate={self.sample_rate}")
+
+    @property
+    def ext(self):
+        return ".wav"
+
+    def voices(self):
+        return [{"id": id, "name": name} for id, name, _ in self.VOICES]
+
+    def duration(self, text, rate):
+        words = max(1.0, len(text.strip()) / CHARACTERS_PER_WORD)
+        return words * 60.0 / max(1, rate)
+
+    def frequency(self, voice):
+        for id, _, frequency in self.VOICES:
+            if id == voice:
+                return frequency
+        raise ValueError(f"Unknown voice {voice}")
+
+    def samples(self, text, voice, rate):
+        """Returns the 8-bit samples of a line's audio."""
+
+        count = int(self.duration(text, rate) * self.sample_rate)
+        if self.audio == "silent":
+            return bytes([128]) * count
+        step = 2 * math.pi * self.frequency(voice) / self.sample_rate
+        return (
+            array.array(
+                "B",
+                (
+                    int(128 + 64 * math.sin(n * step))
+                        for n
+                        in range(count)))
+                .tobytes())
+
+    def say(self, text, voice, rate):
+        self.frequency(voice)
+        self.pending.append((self.duration(text, rate), None))
+
+    def save(self, text, voice, rate, path):
+        self.frequency(voice)
+        self.pending.append((self.latency, (text, voice, rate, path)))
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        self.stopped.clear()
+        for seconds, line in pending:
+            if line is None:
+                if self.stopped.wait(seconds):
+                    break
+            else:
+                time.sleep(seconds)
+                text, voice, rate, path = line
+                with wave.open(f"{path}", "wb") as f:
+                    f.setnchannels(1)
+                    f.setsampwidth(1)
+                    f.setframerate(self.sample_rate)
+                    f.writeframes(self.samples(text, voice, rate))
+
+    def stop(self):
+        self.pending = []
+        self.stopped.set()
+
+
+ENGINES = {
+    "pyttsx3": Pyttsx3Engine,
+    "fake": FakeEngine,
+}
+
+
+def engine_option(name, value):
+    try:
+        return (
+            value
+                if name == "audio"
+                else int(value)
+                    if name == "sample_rate"
+                    else float(value))
+    except ValueError:
+        raise ValueError(f"Invalid engine option {name}={value}")
+
+
+def selected_engine():
+    """Returns the engine spec from the `TXT2DUB_ENGINE` environment
+    variable, or the default engine."""
+
+    return os.environ.get("TXT2DUB_ENGINE") or DEFAULT_ENGINE
+
+
+def create_engine(spec=None):
+    """Creates the engine named by `spec`, which defaults to the
+    `TXT2DUB_ENGINE` environment variable or pyttsx3. Options follow the
+    name, like `fake:latency=0.05,audio=tone`."""
+
+    spec = spec or selected_engine()
+    name, _, options = spec.partition(":")
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown engine {name}")
+    kwargs = {}
+    for option in options.split(","):
+        if option:
+            key, separator, value = option.partition("=")
+            if not separator:
+                raise ValueError(f"Invalid engine option {option}")
+            key = key.strip().replace("-", "_")
+            kwargs[key] = engine_option(key, value.strip())
+    try:
+        return engine(**kwargs)
+    except TypeError:
+        raise ValueError(f"Invalid options for the {name} engine")
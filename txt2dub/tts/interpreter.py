@@ -1,25 +1,61 @@
+import contextlib
 import json
+import os
 import pathlib
-import platform
+import queue
 import signal
 import sys
-import tempfile
-import zipfile
-
-import pyttsx3
+import threading
+import time
+from . import audio
+from .cache import AudioCache, audio_key
+from .engines import create_engine
+from .output import MANIFEST, create_output, previous_keys
+from .player import Player
 
 
 class Interpreter(object):
-    """The text-to-speech interpreter."""
+    """The text-to-speech interpreter.
+
+    Requests are read on a background thread. Commands that drive the
+    engine are queued for the main thread and run one at a time, while
+    other commands are answered as soon as they are read. Responses carry
+    the `id` of their request, so they may be written out of order.
+    """
+
+    ENGINE_COMMANDS = ("play", "render", "generate",)
+    STREAM_COMMANDS = ("lines", "end",)
 
-    def __init__(self, version):
+    def __init__(self, version, cache=None, engine=None):
         self.version = version
-        self.engine = pyttsx3.init()
+        self.cache = (
+            cache
+                if cache is not None
+                else AudioCache())
+        self.engine = (
+            engine
+                if engine is not None
+                else create_engine())
+        self.player = Player()
+        self.metadata = None
         self.alive = True
+        self.requests = queue.Queue()
+        self.write_lock = threading.Lock()
+        self.speech_lock = threading.Lock()
+        self.speaking = False
+        self.playing = False
+        self.stops = 0
+        self.generation = 0
+        self.streams = {}
+        self.streams_lock = threading.Lock()
         signal.signal(signal.SIGTERM, self.die)
 
-    def die(self):
+    def die(self, *_):
         self.alive = False
+        self.requests.put(None)
+        with self.streams_lock:
+            for stream in self.streams.values():
+                stream.put(None)
 
     def readline(self):
         if self.alive:
@@ -30,37 +66,146 @@ class Interpreter(object):
 
     def writeline(self, value):
         if self.alive:
+            with self.write_lock:
+                try:
+                    sys.stdout.write(f"{value}\n")
+                    sys.stdout.flush()
+                except ValueError:
+                    pass
+
+    def respond(self, request, type, value):
+        response = {
+            "type": type,
+            "value": value,
+        }
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        self.writeline(json.dumps(response))
+
+    def handle(self, request):
+        """Dispatches a request and writes its response. Returns `False`
+        if the interpreter should stop after an unexpected error."""
+
+        try:
+            self.respond(request, "result", self.dispatch(request))
+        except ValueError as error:
+            self.respond(request, "error", f"{error}")
+        except Exception as error:
+            self.respond(request, "error", f"{error}")
+            return False
+        return True
+
+    def read(self):
+        more = True
+        while more:
+            line = self.readline()
+            if line:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests must be JSON objects")
+                except ValueError as error:
+                    self.respond(None, "error", f"{error}")
+                else:
+                    if request.get("command") in self.ENGINE_COMMANDS:
+                        if request.get("stream"):
+                            self.open_stream(request.get("id"))
+                        with self.speech_lock:
+                            self.requests.put((self.stops, request))
+                    elif request.get("command") in self.STREAM_COMMANDS:
+                        self.stream_request(request)
+                    else:
+                        more = self.handle(request)
+            else:
+                more = False
+        self.requests.put(None)
+
+    def open_stream(self, id):
+        """Opens a stream of script lines for the streaming request `id`,
+        which is filled by `lines` requests until an `end` request."""
+
+        with self.streams_lock:
+            self.streams[id] = queue.Queue()
+
+    def stream_request(self, request):
+        """Queues a `lines` or `end` request on the stream of its job. It's
+        answered when the job takes it from the stream, so a client that
+        waits for each answer before sending more lines doesn't send them
+        faster than they're generated."""
+
+        try:
+            if request["command"] == "lines":
+                if "job" not in request or "lines" not in request:
+                    raise (
+                        ValueError(
+                            "lines command requires job and lines " \
+                            "parameters"))
+            elif "job" not in request:
+                raise ValueError("end command requires job parameter")
+            with self.streams_lock:
+                stream = self.streams.get(request["job"])
+                if stream is None:
+                    raise ValueError(f"Unknown job {request['job']}")
+                stream.put(request)
+        except ValueError as error:
+            self.respond(request, "error", f"{error}")
+
+    def close_stream(self, id):
+        """Closes the stream of the job `id`, refusing the requests it
+        didn't take."""
+
+        with self.streams_lock:
+            stream = self.streams.pop(id, None)
+        more = stream is not None
+        while more:
             try:
-                sys.stdout.write(f"{value}\n")
-                sys.stdout.flush()
-            except ValueError:
-                pass
+                request = stream.get_nowait()
+            except queue.Empty:
+                more = False
+            else:
+                if request is not None:
+                    self.respond(request, "error", f"Unknown job {id}")
+
+    def stream(self, id):
+        """Yields the script lines of a stream as they arrive, answering
+        each request as it's taken."""
+
+        with self.streams_lock:
+            stream = self.streams[id]
+        more = True
+        while more:
+            request = stream.get()
+            if request is not None:
+                self.respond(request, "result", "ok")
+                if request["command"] == "lines":
+                    yield from request["lines"]
+                else:
+                    more = False
+            else:
+                more = False
+        if not self.alive:
+            raise ValueError("TTS engine stopped")
+
+    def progress(self, request):
+        def progress(event):
+            self.respond(request, "event", event)
+
+        return progress
+
+    @property
+    def interrupted(self):
+        return self.generation != self.stops
 
     def run(self):
+        self.metadata = self.meta()
+        threading.Thread(target=self.read, daemon=True).start()
         more = True
         while more:
             try:
-                request = self.readline()
-                if request:
-                    try:
-                        self.writeline(
-                            json.dumps({
-                                "type": "result",
-                                "value": self.dispatch(json.loads(request)),
-                            }))
-                    except (json.JSONDecodeError, ValueError) as error:
-                        self.writeline(
-                            json.dumps({
-                                "type": "error",
-                                "value": f"{error}",
-                            }))
-                    except Exception as error:
-                        self.writeline(
-                            json.dumps({
-                                "type": "error",
-                                "value": f"{error}",
-                            }))
-                        more = False
+                queued = self.requests.get()
+                if queued is not None:
+                    self.generation, request = queued
+                    more = self.handle(request)
                 else:
                     more = False
             except KeyboardInterrupt:
@@ -70,7 +215,10 @@ class Interpreter(object):
         if "command" in request:
             command = request["command"]
             if command == "meta":
-                return self.meta()
+                return (
+                    self.metadata
+                        if self.metadata is not None
+                        else self.meta())
             elif command == "play":
                 if ("text" in request and
                     "voice" in request and
@@ -82,69 +230,318 @@ class Interpreter(object):
                             "play command requires text, voice and rate " \
                             "parameters"))
 
-            elif command == "generate":
-                if ("path" in request and
-                    "script" in request):
-                    return self.generate(request["path"], request["script"])
+            elif command == "stop":
+                return self.stop()
+            elif command == "render":
+                if "lines" in request:
+                    return (
+                        self.render(
+                            request["lines"],
+                            request.get("directory"),
+                            self.progress(request)))
                 else:
                     raise (
                         ValueError(
-                            "generate command requires path and script " \
+                            "render command requires lines parameter"))
+            elif command == "previous":
+                if "path" in request and "lines" in request:
+                    return (
+                        self.previous(
+                            request["path"],
+                            request["lines"],
+                            request.get("mode", "zip")))
+                else:
+                    raise (
+                        ValueError(
+                            "previous command requires path and lines " \
                             "parameters"))
+            elif command == "generate":
+                if ("path" in request and (
+                        "script" in request or
+                        request.get("stream"))):
+
+                    try:
+                        return (
+                            self.generate(
+                                request["path"],
+                                self.stream(request.get("id"))
+                                    if request.get("stream")
+                                    else request["script"]["lines"],
+                                request.get("incremental", True),
+                                request.get("rendered"),
+                                self.progress(request),
+                                request.get("mode", "zip"),
+                                request.get("compression", "stored")))
+                    finally:
+                        if request.get("stream"):
+                            self.close_stream(request.get("id"))
+                else:
+                    raise (
+                        ValueError(
+                            "generate command requires path and either " \
+                            "script or stream parameters"))
             else:
                 raise ValueError(f"Unknown command {command}")
 
+    @property
+    def driver(self):
+        return self.engine.driver
+
     def meta(self):
-        driver = self.engine.proxy._driver.__class__
         return {
            "version": self.version,
-           "driver": f"{driver.__module__}.{driver.__name__}",
-           "voices": [
-                {
-                    "id": voice.id,
-                    "name": voice.name
-                }
-                    for voice in
-                    self.engine.getProperty("voices")
-           ]
+           "driver": self.driver,
+           "voices": self.engine.voices()
         }
 
+    @property
+    def ext(self):
+        return self.engine.ext
+
+    def key(self, text, voice, rate):
+        return audio_key(self.driver, voice, rate, text, self.version)
+
     def play(self, text, voice, rate):
-        self.engine.setProperty("voice", voice)
-        self.engine.setProperty("rate", rate)
-        self.engine.say(text)
-        self.engine.runAndWait()
+        """Speaks a line, playing its audio from the cache instead when it
+        has already been rendered and there is an audio player."""
+
+        source = (
+            self.cache.get(self.key(text.strip(), voice, rate), self.ext)
+                if self.player.available
+                else None)
+        with self.speech_lock:
+            if self.interrupted:
+                return "cancelled"
+            if source is not None:
+                self.player.reset()
+            else:
+                self.engine.say(text, voice, rate)
+            self.speaking = True
+            self.playing = source is not None
+        try:
+            if source is not None:
+                self.player.play(source)
+            else:
+                self.engine.run()
+        finally:
+            with self.speech_lock:
+                self.speaking = False
+                self.playing = False
+        return (
+            "cancelled"
+                if self.interrupted
+                else "ok")
+
+    def stop(self):
+        """Interrupts the line being spoken and cancels queued play
+        requests. This is answered from the request reading thread, so it
+        doesn't wait for the engine."""
+
+        with self.speech_lock:
+            self.stops += 1
+            pending = []
+            with contextlib.suppress(queue.Empty):
+                while True:
+                    pending.append(self.requests.get_nowait())
+            for queued in pending:
+                if queued is not None and queued[1].get("command") == "play":
+                    self.respond(queued[1], "result", "cancelled")
+                else:
+                    self.requests.put(
+                        (self.stops, queued[1])
+                            if queued is not None
+                            else None)
+            if self.playing:
+                self.player.stop()
+            elif self.speaking:
+                self.engine.stop()
         return "ok"
 
-    def generate(self, path, script):
-        ext = (
-            ".aiff"
-                if platform.system() == "Darwin"
-                else ".mp3")
-        with zipfile.ZipFile(path, "w") as zf:
-            with zf.open("lines.txt", "w") as f:
-                for n, line in enumerate(script["lines"]):
-                    text = line["text"].strip()
-                    f.write(f"{n:0>4d}: {text}\n".encode("utf-8"))
-            with zf.open("script.txt", "w") as f:
-                for line in script["lines"]:
-                    text = line["text"].strip()
-                    if text:
-                        f.write(f"{text}\n".encode("utf-8"))
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                batch = []
-                for n, line in enumerate(script["lines"]):
+    def render(self, lines, directory=None, progress=None):
+        """Renders the audio for script lines into the cache, or into
+        `directory` when the cache is disabled, without writing a zip.
+        Returns the number of lines that were synthesized."""
+
+        if not self.cache.enabled and directory is None:
+            raise (
+                ValueError(
+                    "render command requires a directory when the " \
+                    "cache is disabled"))
+        ext = self.ext
+        with self.cache.scratch() as tmp_dir:
+            misses = set()
+            for line in lines:
+                text = line["text"].strip()
+                if text:
+                    started = time.monotonic()
+                    voice = line["voice"]["id"]
+                    rate = line["voice"]["rate"]
+                    key = self.key(text, voice, rate)
+                    source = self.cache.get(key, ext)
+                    if (source is None and
+                        directory is not None and
+                        (pathlib.Path(directory) / f"{key}{ext}").exists()):
+
+                        source = pathlib.Path(directory) / f"{key}{ext}"
+                    cached = key in misses or source is not None
+                    if not cached:
+                        source = (
+                            pathlib.Path(
+                                tmp_dir
+                                    if self.cache.enabled
+                                    else directory) /
+                            f"{key}{ext}")
+                        self.synthesize(text, voice, rate, source)
+                        if self.cache.enabled:
+                            source = self.cache.put(key, ext, source)
+                        misses.add(key)
+                    if progress is not None:
+                        with contextlib.suppress(OSError):
+                            with open(source, "rb") as f:
+                                progress({
+                                    "event": "render",
+                                    "index": line.get("index"),
+                                    "cached": cached,
+                                    "bytes": os.fstat(f.fileno()).st_size,
+                                    "duration": audio.duration(f),
+                                    "elapsed": time.monotonic() - started,
+                                })
+        return len(misses)
+
+    def previous(self, path, lines, mode="zip"):
+        """Returns the positions of the script lines whose audio is
+        already in the output at `path`, which generating there again
+        reuses without rendering them."""
+
+        keys = previous_keys(path, mode)
+        previous = []
+        for n, line in enumerate(lines):
+            text = line["text"].strip()
+            voice = line["voice"]
+            if text and self.key(text, voice["id"], voice["rate"]) in keys:
+                previous.append(n)
+        return previous
+
+    def synthesize(self, text, voice, rate, path):
+        self.engine.save(text, voice, rate, path)
+        self.engine.run()
+
+    def generate(self,
+                 path,
+                 lines,
+                 incremental=True,
+                 rendered=None,
+                 progress=None,
+                 mode="zip",
+                 compression="stored"):
+        """Generates the audio for script lines at `path`, reusing audio
+        from the cache, from `rendered` and from previous output at `path`.
+
+        `lines`
+            an iterable of serialized script lines, which may still be
+            arriving while earlier lines are rendered
+        `progress`
+            an optional function called with an event for each line
+            written to the output
+        `mode`
+            `"zip"` for a zip archive, or `"directory"` for files
+            written in place
+        `compression`
+            the zip compression method, one of `"stored"`, `"deflated"`,
+            `"bzip2"` or `"lzma"`
+
+        Returns a summary of the generated lines.
+        """
+        ext = self.ext
+        driver = self.driver
+        started = time.monotonic()
+        summary = {
+            "lines": 0,
+            "rendered": 0,
+            "bytes": 0,
+            "duration": 0.0,
+        }
+        output = (
+            create_output(
+                path,
+                mode,
+                compression,
+                incremental,
+                self.cache.directory
+                    if self.cache.enabled
+                    else None))
+        with output:
+            with (
+                self.cache.scratch()
+                    if self.cache.enabled
+                    else output.scratch()) as tmp_dir:
+
+                texts = []
+                misses = {}
+                manifest = []
+                for n, line in enumerate(lines):
                     text = line["text"].strip()
+                    texts.append(text)
                     if text:
-                        name = pathlib.Path(f"{n:0>4d}{ext}")
-                        tmp = pathlib.Path(tmp_dir) / name
-                        self.engine.setProperty("voice", line["voice"]["id"])
-                        self.engine.setProperty("rate", line["voice"]["rate"])
-                        self.engine.save_to_file(text, f"{tmp}")
-                        batch.append((name, tmp))
-                self.engine.runAndWait()
-                for name, tmp in batch:
-                    with open(tmp, "r+b") as t:
-                        with zf.open(f"{name}", "w") as f:
-                            f.write(t.read())
-        return "ok"
+                        line_started = time.monotonic()
+                        name = f"{n:0>4d}{ext}"
+                        voice = line["voice"]["id"]
+                        rate = line["voice"]["rate"]
+                        key = self.key(text, voice, rate)
+                        source = (
+                            misses.get(key) or
+                            self.cache.get(key, ext) or
+                            output.previous.get(key))
+                        if source is None and rendered is not None:
+                            source = pathlib.Path(rendered) / f"{key}{ext}"
+                            if not source.exists():
+                                source = None
+                        cached = source is not None
+                        if not cached:
+                            source = pathlib.Path(tmp_dir) / f"{key}{ext}"
+                            self.synthesize(text, voice, rate, source)
+                            misses[key] = source
+                        size, length = output.add(name, source)
+                        manifest.append({"name": name, "key": key})
+                        summary["lines"] += 1
+                        summary["rendered"] += 0 if cached else 1
+                        summary["bytes"] += size
+                        summary["duration"] += length or 0.0
+                        if progress is not None:
+                            progress({
+                                "event": "line",
+                                "index": n,
+                                "name": name,
+                                "cached": cached,
+                                "bytes": size,
+                                "duration": length,
+                                "elapsed": time.monotonic() - line_started,
+                            })
+                    else:
+                        manifest.append(None)
+                output.write(
+                    "lines.txt",
+                    "".join(
+                        f"{n:0>4d}: {text}\n"
+                            for n, text
+                            in enumerate(texts))
+                    .encode("utf-8"))
+                output.write(
+                    "script.txt",
+                    "".join(
+                        f"{text}\n"
+                            for text
+                            in texts
+                            if text)
+                    .encode("utf-8"))
+                output.write(
+                    MANIFEST,
+                    json.dumps({
+                        "version": self.version,
+                        "driver": driver,
+                        "lines": manifest,
+                    }))
+                for key, source in misses.items():
+                    self.cache.put(key, ext, source)
+        summary["elapsed"] = time.monotonic() - started
+        return summary
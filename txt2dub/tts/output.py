@@ -0,0 +1,245 @@
+import contextlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import uuid
+import zipfile
+from . import audio
+
+
+MANIFEST = "manifest.json"
+
+COMPRESSION = {
+    "stored": zipfile.ZIP_STORED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+
+def read_manifest(data, names):
+    """Returns a mapping of audio keys to entry names from manifest JSON,
+    skipping entries that aren't in `names`."""
+
+    manifest = json.loads(data)
+    return {
+        line["key"]: line["name"]
+            for line
+            in manifest["lines"]
+            if line is not None and line["name"] in names
+    }
+
+
+def previous_keys(path, mode="zip"):
+    """Returns the audio keys of the lines in the output at `path`, which
+    an incremental generate there can reuse instead of rendering."""
+
+    with contextlib.suppress(
+            OSError,
+            KeyError,
+            TypeError,
+            ValueError,
+            zipfile.BadZipFile):
+
+        if mode == "zip":
+            with zipfile.ZipFile(path, "r") as zf:
+                return (
+                    set(read_manifest(zf.read(MANIFEST), set(zf.namelist()))))
+        elif mode == "directory":
+            with open(pathlib.Path(path) / MANIFEST, "rb") as f:
+                return set(read_manifest(f.read(), set(os.listdir(path))))
+    return set()
+
+
+class ZipOutput(object):
+    """Generated audio written to a zip archive.
+
+    The archive is assembled next to `path` and renamed over it when
+    complete, so a failed generate leaves the previous archive intact.
+    Entries of the previous archive can be used as sources, by name.
+    """
+
+    def __init__(self, path, compression="stored", incremental=True):
+        if compression not in COMPRESSION:
+            raise ValueError(f"Unknown compression {compression}")
+        self.path = pathlib.Path(path)
+        self.compression = COMPRESSION[compression]
+        self.incremental = incremental
+        self.tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.previous = {}
+        self.stack = None
+        self.zf = None
+        self.old = None
+
+    def __enter__(self):
+        self.stack = contextlib.ExitStack()
+        try:
+            if self.incremental:
+                with contextlib.suppress(
+                        OSError,
+                        KeyError,
+                        TypeError,
+                        ValueError,
+                        zipfile.BadZipFile):
+
+                    old = self.stack.enter_context(
+                        zipfile.ZipFile(self.path, "r"))
+                    self.previous = (
+                        read_manifest(
+                            old.read(MANIFEST),
+                            set(old.namelist())))
+                    self.old = old
+            self.zf = self.stack.enter_context(
+                zipfile.ZipFile(
+                    self.tmp_path,
+                    "w",
+                    compression=self.compression))
+        except BaseException:
+            self.stack.close()
+            raise
+        return self
+
+    def __exit__(self, type, value, traceback):
+        try:
+            self.stack.close()
+            if type is None:
+                os.replace(self.tmp_path, self.path)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(self.tmp_path)
+
+    def scratch(self):
+        return tempfile.TemporaryDirectory()
+
+    def open(self, source):
+        return (
+            self.old.open(source, "r")
+                if isinstance(source, str)
+                else open(source, "rb"))
+
+    def add(self, name, source):
+        """Copies audio from `source` into the entry `name`, in chunks.
+        Returns the size and duration of the audio."""
+
+        with self.open(source) as f:
+            length = audio.duration(f)
+            with self.zf.open(name, "w") as t:
+                shutil.copyfileobj(f, t)
+        return self.zf.getinfo(name).file_size, length
+
+    def write(self, name, data):
+        self.zf.writestr(name, data)
+
+
+class DirectoryOutput(object):
+    """Generated audio written as files in a directory.
+
+    Files are staged in a hidden directory inside `path`, hard linked
+    from their sources when possible, and moved into place when complete.
+    Files listed in the previous manifest can be used as sources.
+
+    Sources inside the `shared` directory, like the audio cache, are
+    copied instead, since linking them would let the cache touch or
+    replace delivered files.
+    """
+
+    def __init__(self, path, incremental=True, shared=None):
+        self.path = pathlib.Path(path)
+        self.incremental = incremental
+        self.shared = (
+            os.path.abspath(shared)
+                if shared is not None
+                else None)
+        self.staging = self.path / f".staging-{uuid.uuid4().hex}"
+        self.previous = {}
+        self.stale = set()
+
+    def __enter__(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with contextlib.suppress(
+                OSError,
+                KeyError,
+                TypeError,
+                ValueError):
+
+            with open(self.path / MANIFEST, "rb") as f:
+                names = set(os.listdir(self.path))
+                previous = read_manifest(f.read(), names)
+            self.stale = set(previous.values())
+            if self.incremental:
+                self.previous = {
+                    key: self.path / name
+                        for key, name
+                        in previous.items()
+                }
+        self.staging.mkdir()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        try:
+            if type is None:
+                staged = set(os.listdir(self.staging))
+                for name in self.stale - staged:
+                    with contextlib.suppress(OSError):
+                        os.remove(self.path / name)
+                for name in staged:
+                    os.replace(self.staging / name, self.path / name)
+        finally:
+            shutil.rmtree(self.staging, ignore_errors=True)
+
+    def scratch(self):
+        return tempfile.TemporaryDirectory(prefix=".scratch-", dir=self.path)
+
+    def open(self, source):
+        return open(source, "rb")
+
+    def linkable(self, source):
+        if self.shared is None:
+            return True
+        try:
+            return (
+                os.path.commonpath([os.path.abspath(source), self.shared]) !=
+                self.shared)
+        except ValueError:
+            return True
+
+    def add(self, name, source):
+        """Links or copies audio from `source` to the file `name`.
+        Returns the size and duration of the audio."""
+
+        target = self.staging / name
+        linked = False
+        if self.linkable(source):
+            with contextlib.suppress(OSError):
+                os.link(source, target)
+                linked = True
+        if not linked:
+            shutil.copyfile(source, target)
+        with open(target, "rb") as f:
+            return os.fstat(f.fileno()).st_size, audio.duration(f)
+
+    def write(self, name, data):
+        with open(self.staging / name, "wb") as f:
+            f.write(
+                data.encode("utf-8")
+                    if isinstance(data, str)
+                    else data)
+
+
+def create_output(path,
+                  mode="zip",
+                  compression="stored",
+                  incremental=True,
+                  shared=None):
+    """Returns the output for generated audio at `path`, where `mode` is
+    either `"zip"` or `"directory"`. Directory outputs copy sources inside
+    the `shared` directory rather than linking them."""
+
+    if mode == "zip":
+        return ZipOutput(path, compression, incremental)
+    elif mode == "directory":
+        return DirectoryOutput(path, incremental, shared)
+    else:
+        raise ValueError(f"Unknown output mode {mode}")
@@ -0,0 +1,86 @@
+import platform
+import shutil
+import subprocess
+import threading
+from . import audio
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+
+class Player(object):
+    """Plays rendered audio files through the platform's audio player, so
+    that audio from the cache can be heard without synthesizing it again.
+    """
+
+    COMMANDS = {
+        "Darwin": (
+            ("afplay",),),
+        "Linux": (
+            ("paplay",),
+            ("aplay", "-q",),
+            ("ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",),),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.process = None
+        self.command = next(
+            (
+                command
+                    for command
+                    in self.COMMANDS.get(platform.system(), ())
+                    if shutil.which(command[0]) is not None
+            ),
+            None)
+
+    @property
+    def available(self):
+        return winsound is not None or self.command is not None
+
+    def reset(self):
+        """Readies the player for the next file, after it was stopped."""
+
+        self.stopped.clear()
+
+    def play(self, path):
+        """Plays the audio file at `path`, returning when it has finished
+        or has been stopped. Playback is skipped if the player was stopped
+        since it was last reset."""
+
+        if winsound is not None:
+            with open(path, "rb") as f:
+                length = audio.duration(f)
+            if self.stopped.is_set():
+                return
+            winsound.PlaySound(
+                f"{path}",
+                winsound.SND_FILENAME |
+                winsound.SND_ASYNC |
+                winsound.SND_NODEFAULT)
+            if self.stopped.wait(length or 0):
+                winsound.PlaySound(None, 0)
+        else:
+            with self.lock:
+                if self.stopped.is_set():
+                    return
+                self.process = (
+                    subprocess.Popen(
+                        [*self.command, f"{path}"],
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL))
+            try:
+                self.process.wait()
+            finally:
+                with self.lock:
+                    self.process = None
+
+    def stop(self):
+        with self.lock:
+            self.stopped.set()
+            if self.process is not None:
+                self.process.terminate()